@@ -1,5 +1,13 @@
 import pytest
 
+from plover import system
+from plover.registry import registry
+
+from plover_markdown_dictionary import MarkdownDictionary, load_cache
+
+registry.update()
+system.setup("English Stenotype")
+
 
 def pytest_addoption(parser):
     parser.addoption(
@@ -19,3 +27,21 @@ def pytest_collection_modifyitems(config, items):
     for item in items:
         if "slow" in item.keywords:
             item.add_marker(skip_slow)
+
+
+@pytest.fixture(autouse=True)
+def parse_cache_dir(tmp_path, monkeypatch):
+    """Keep the parse cache out of the user's cache directory."""
+    cache_dir = tmp_path / "parse_cache"
+    monkeypatch.setattr(MarkdownDictionary, "PARSE_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def no_load_cache(monkeypatch):
+    """Don't share parses between tests, which often load the same files.
+    Tests of the load cache turn it back on."""
+    load_cache.clear()
+    monkeypatch.setattr(MarkdownDictionary, "LOAD_CACHE", False)
+    yield
+    load_cache.clear()
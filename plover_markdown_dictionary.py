@@ -1,6 +1,32 @@
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from copy import copy
+import gc
+import hashlib
+import json
+from itertools import accumulate, chain, islice
+import locale
+import mmap
+import multiprocessing
+import os
+import pickle
 import re
-from dataclasses import dataclass
+import shutil
+import struct
+import sys
+import threading
+import time
+import weakref
+import zlib
 
+import appdirs
+
+from plover import log, system
+from plover.registry import registry
+from plover.resource import resource_filename, resource_timestamp
 from plover.steno import normalize_steno
 from plover.steno_dictionary import StenoDictionary
 
@@ -8,31 +34,165 @@ from plover.steno_dictionary import StenoDictionary
 DELETED_PREFIX = "(DELETED) "
 UPDATED_PREFIX = "(UPDATED) "
 
+# How to escape a value for each kind of quotes around it, and the
+# characters that need escaping.
+ESCAPES = {"\\": "\\\\", "\n": "\\\\n", "\r": "\\\\r", "\t": "\\\\t"}
+ESCAPE_TABLES = {
+    "": str.maketrans({**ESCAPES, '"': '\\"', "'": "\\'", "#": "\\#"}),
+    "'": str.maketrans({**ESCAPES, "'": "\\'"}),
+    '"': str.maketrans({**ESCAPES, '"': '\\"'}),
+}
+NEEDS_ESCAPING = {
+    quote: re.compile("[" + re.escape("".join(map(chr, table))) + "]")
+    for quote, table in ESCAPE_TABLES.items()
+}
+NEEDS_QUOTES = re.compile("[\"'#]")
+
+
+def escape_value(value, value_quote):
+    """Escape ``value`` to be written between ``value_quote``s."""
+    if NEEDS_ESCAPING[value_quote].search(value) is None:
+        return value
+    return value.translate(ESCAPE_TABLES[value_quote])
+
+
+def quote_for_value(value):
+    """The quotes to write a new value with: none, unless it has quotes, #
+    or spaces at either end. Then double quotes, unless it has double quotes
+    but not single quotes."""
+    if NEEDS_QUOTES.search(value) is None and value[:1] != " " and value[-1:] != " ":
+        return ""
+    if '"' not in value or "'" in value:
+        return '"'
+    return "'"
+
 
-@dataclass
 class Prose:
     kind = "prose"
-    text: str
-    is_new: bool = False
+    __slots__ = ("text", "is_new")
+
+    def __init__(self, text, is_new=False):
+        self.text = text
+        self.is_new = is_new
 
     def __str__(self):
         return self.text
 
+    def __repr__(self):
+        return f"Prose(text={self.text!r}, is_new={self.is_new!r})"
+
+    def __eq__(self, other):
+        if type(other) is not Prose:
+            return NotImplemented
+        return self.text == other.text and self.is_new == other.is_new
+
+    def __reduce__(self):
+        return Prose, (self.text, self.is_new)
+
 
-@dataclass
 class Entry:
+    """A line with a dictionary entry.
+
+    There are hundreds of thousands of these in a big dictionary, so they're
+    kept small: ``key_string`` is only stored if it isn't the same as
+    ``"/".join(key)``, and separators are interned so that lines share them.
+
+    ``text`` is the line as it's written to the file. It's kept from when the
+    line was read, or made from the fields when first needed, so it has to be
+    set to ``None`` when the fields change.
+    """
+
     kind = "entry"
-    key: str
-    key_string: str
-    key_quote: str
-    value: str
-    updated_value: str
-    value_quote: str
-    separator: str
-    comment_padding: str
-    comment: str
-    is_deleted: bool
-    is_new: bool
+    __slots__ = (
+        "key",
+        "_key_string",
+        "key_quote",
+        "value",
+        "updated_value",
+        "value_quote",
+        "separator",
+        "comment_padding",
+        "comment",
+        "is_deleted",
+        "is_new",
+        "_text",
+    )
+    fields = (
+        "key",
+        "key_string",
+        "key_quote",
+        "value",
+        "updated_value",
+        "value_quote",
+        "separator",
+        "comment_padding",
+        "comment",
+        "is_deleted",
+        "is_new",
+    )
+
+    def __init__(
+        self,
+        key,
+        key_string,
+        key_quote="",
+        value=None,
+        updated_value=None,
+        value_quote="",
+        separator=": ",
+        comment_padding="",
+        comment="",
+        is_deleted=False,
+        is_new=False,
+        text=None,
+    ):
+        self.key = key
+        self._key_string = None if key_string == "/".join(key) else key_string
+        self.key_quote = key_quote
+        self.value = value
+        self.updated_value = updated_value
+        self.value_quote = value_quote
+        self.separator = separator if separator == ": " else sys.intern(separator)
+        self.comment_padding = comment_padding
+        self.comment = comment
+        self.is_deleted = is_deleted
+        self.is_new = is_new
+        self._text = text
+
+    @property
+    def key_string(self):
+        if self._key_string is None:
+            return "/".join(self.key)
+        return self._key_string
+
+    @key_string.setter
+    def key_string(self, key_string):
+        self._key_string = None if key_string == "/".join(self.key) else key_string
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = str(self)
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self._text = text
+
+    def __repr__(self):
+        return "Entry({})".format(
+            ", ".join(f"{name}={getattr(self, name)!r}" for name in self.fields)
+        )
+
+    def __eq__(self, other):
+        if type(other) is not Entry:
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.fields
+        )
+
+    def __reduce__(self):
+        return Entry, (*(getattr(self, name) for name in self.fields), self._text)
 
     def __str__(self):
         prefix_string = (
@@ -43,36 +203,16 @@ class Entry:
             else ""
         )
 
-        value_to_write = (
-            (self.updated_value or self.value)
-            .replace("\\", "\\\\")
-            .replace("\n", "\\\\n")
-            .replace("\r", "\\\\r")
-            .replace("\t", "\\\\t")
+        value_to_write = escape_value(
+            self.updated_value or self.value, self.value_quote
         )
-        if self.value_quote == "":
-            value_to_write = (
-                value_to_write.replace('"', '\\"')
-                .replace("'", "\\'")
-                .replace("#", "\\#")
-            )
-        elif self.value_quote == "'":
-            value_to_write = value_to_write.replace("'", "\\'")
-        else:
-            value_to_write = value_to_write.replace('"', '\\"')
+        key_quote = self.key_quote
+        value_quote = self.value_quote
 
         return (
-            prefix_string
-            + self.key_quote
-            + self.key_string
-            + self.key_quote
-            + self.separator
-            + self.value_quote
-            + value_to_write
-            + self.value_quote
-            + self.comment_padding
-            + self.comment
-            + "\n"
+            f"{prefix_string}{key_quote}{self.key_string}{key_quote}"
+            f"{self.separator}{value_quote}{value_to_write}{value_quote}"
+            f"{self.comment_padding}{self.comment}\n"
         )
 
     @property
@@ -80,38 +220,255 @@ class Entry:
         return self.value != self.updated_value
 
 
-first_pattern = re.compile(
-    rf"((?:"
-    + re.escape(DELETED_PREFIX)
-    + ")?(?:"
-    + re.escape(UPDATED_PREFIX)
-    + ")?)"
-    + r"([^:\s]+)(\s*:\s*)([^\n]+)\n"
-)
-right_quote_pattern = {}
-for q in ['"', "'"]:
-    right_quote_pattern[q] = re.compile(
-        rf"{q}((?:[^{q}\n\\]|\\\\|\\{q})*){q}"  # quoted value
-        + r"([^\n\S]*)"  # spaces before comment
-        + r"(#[^\n]*)?"  # comment
+PREFIXES = (DELETED_PREFIX + UPDATED_PREFIX, DELETED_PREFIX, UPDATED_PREFIX, "")
+QUOTES = ('"', "'")
+ESCAPABLE = ("\\", '"', "'", "#")
+
+
+def split_entry_line(text, start):
+    """Split ``text[start:]`` into ``(left, separator, right)``.
+
+    ``text`` must end with a newline, which isn't part of ``right``. Returns
+    ``None`` if the text doesn't look like ``key: value``.
+    """
+    end = len(text) - 1
+    colon = text.find(":", start, end)
+    if colon == -1:
+        return None
+
+    left = text[start:colon].rstrip()
+    # The key can't be empty or contain whitespace. Apart from " ", all
+    # whitespace is unprintable, so the split is rarely needed.
+    if (
+        not left
+        or " " in left
+        or (not left.isprintable() and left.split(None, 1) != [left])
+    ):
+        return None
+
+    after_colon = text[colon + 1 : end]
+    right = after_colon.lstrip()
+    if right:
+        if "\n" in right:
+            return None
+    elif after_colon and after_colon[-1] != "\n":
+        # Nothing but whitespace after the colon: the last character becomes
+        # the (blank) right hand side
+        right = after_colon[-1]
+    else:
+        return None
+
+    key_end = start + len(left)
+    return left, text[key_end : end - len(right)], right
+
+
+def scan_right(right):
+    """Split the right hand side of an entry into its parts.
+
+    Returns ``(value_quote, raw_value, padding, comment)``, where
+    ``raw_value`` still has its escapes, or ``None`` if it can't be parsed.
+    """
+    end = len(right)
+    q = right[0]
+    if q in QUOTES:
+        # the value ends at the first quote that isn't escaped
+        i = 1
+        quote = right.find(q, i)
+        while True:
+            if quote == -1:
+                return None
+            backslash = right.find("\\", i, quote)
+            if backslash == -1:
+                break
+            if right[backslash + 1 : backslash + 2] not in ("\\", q):
+                return None
+            i = backslash + 2
+            if i > quote:
+                quote = right.find(q, i)
+        value = right[1:quote]
+        i = quote + 1
+    else:
+        q = ""
+        if (
+            "\\" not in right
+            and '"' not in right
+            and "'" not in right
+            and "#" not in right
+        ):
+            value = right.rstrip()
+            return q, value, right[len(value) :], ""
+
+        # Jump from one special character to the next. ``found`` holds the
+        # next position of each special character, and each is only searched
+        # for again once it has been passed.
+        found = {c: right.find(c) for c in ESCAPABLE}
+        i = 0
+        while True:
+            for c, position in found.items():
+                if -1 < position < i:
+                    found[c] = right.find(c, i)
+            special = min(
+                (position for position in found.values() if position != -1),
+                default=end,
+            )
+            plain = right[i:special]
+            plain_value = plain.rstrip()
+            if special == end:
+                i += len(plain_value)
+                break
+
+            c = right[special]
+            after_space = plain_value != plain
+            if c == "\\" and right[special + 1 : special + 2] in ESCAPABLE:
+                i = special + 2
+            elif c in QUOTES and after_space:
+                i = special + 1
+            else:
+                i += len(plain_value)
+                break
+        value = right[:i]
+
+    rest = right[i:]
+    comment = rest.lstrip()
+    if comment and comment[0] != "#":
+        return None
+    return q, value, rest[: len(rest) - len(comment)], comment
+
+
+def scan_entry(text):
+    """Split an entry line into its parts without using regular expressions.
+
+    Returns ``(prefix, left, separator, value_quote, raw_value, padding,
+    comment)`` or raises ``ValueError``.
+
+    Every step either moves forward through the line or hands a bounded run of
+    characters to a ``str`` method, and at most four prefixes are tried, so
+    this is linear in the length of ``text``. (The old regular expressions
+    could backtrack polynomially on long values with lots of spaces.)
+    """
+    if text[-1:] != "\n":
+        raise ValueError(f"Couldn't parse {text}")
+
+    for prefix in PREFIXES if text[0] == "(" else ("",):
+        if text.startswith(prefix):
+            parts = split_entry_line(text, len(prefix))
+            if parts is not None:
+                break
+    else:
+        raise ValueError(f"Couldn't parse {text}")
+
+    left, separator, right = parts
+    right_parts = scan_right(right)
+    if right_parts is None:
+        raise ValueError(f"Couldn't parse the right side of {text}")
+
+    return (prefix, left, separator) + right_parts
+
+
+class StrokeCache:
+    """Normalizes keys, keeping one copy of each stroke for all dictionaries,
+    so that every key with the same stroke shares one string.
+
+    It's emptied when it holds ``max_size`` strokes. ``hits`` counts strokes
+    that were already there, and ``misses`` the ones that weren't.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.strokes = {}
+        self.lookups = 0
+        self.cleared_misses = 0
+
+    @property
+    def misses(self):
+        return self.cleared_misses + len(self.strokes)
+
+    @property
+    def hits(self):
+        return self.lookups - self.misses
+
+    def normalize(self, key_string):
+        strokes = self.strokes
+        if len(strokes) >= self.max_size:
+            self.clear()
+        key = normalize_steno(key_string)
+        self.lookups += len(key)
+        return tuple(map(strokes.setdefault, key, key))
+
+    def clear(self):
+        self.cleared_misses += len(self.strokes)
+        self.strokes.clear()
+
+
+STROKE_CACHE_SIZE = 2 ** 16
+stroke_cache = StrokeCache(STROKE_CACHE_SIZE)
+
+
+def split_plain_entry(text):
+    """Split a line like ``STROKE: translation`` into ``(key_string, value,
+    padding)``.
+
+    Returns ``None`` unless the line has no prefix, quotes, escapes or
+    comment, and exactly ": " between the key and the value.
+    """
+    if (
+        text[0] == "("
+        or "\\" in text
+        or "#" in text
+        or '"' in text
+        or "'" in text
+        or text[-1] != "\n"
+    ):
+        return None
+
+    colon = text.find(":")
+    if colon <= 0 or text[colon + 1 : colon + 2] != " ":
+        return None
+    key_string = text[:colon]
+    if " " in key_string or not key_string.isprintable():
+        return None
+    rest = text[colon + 2 : -1]
+    if not rest or rest[0].isspace() or "\n" in rest:
+        return None
+    value = rest.rstrip()
+    return key_string, value, rest[len(value) :]
+
+
+def plain_entry_from_text(text, is_new=False):
+    """Build an ``Entry`` for a line like ``STROKE: translation``, or return
+    ``None`` if ``split_plain_entry`` can't split it."""
+    parts = split_plain_entry(text)
+    if parts is None:
+        return None
+    key_string, value, padding = parts
+    # these are escaped when writing the line
+    round_trips = "\t" not in value and "\r" not in value
+
+    return Entry(
+        key=stroke_cache.normalize(key_string),
+        key_string=key_string,
+        key_quote="",
+        value=value,
+        updated_value=value,
+        value_quote="",
+        separator=": ",
+        comment_padding=padding,
+        comment="",
+        is_deleted=False,
+        is_new=is_new,
+        text=text if round_trips else None,
     )
-right_no_quote_pattern = re.compile(
-    r"""((?:[^'"\\\#\n\s]|\\\\|\\"|\\'|\\\#|[^\S\n]+(?:[^\#\s\\]|\\\\|\\"|\\'|\\\#))*)"""  # value
-    + r"([^\n\S]*)"  # spaces before comment
-    + r"((?:#[^\n]*)?)"  # comment
-)
 
 
 def entry_from_text(text, is_new=False):
     if text == "":
         raise ValueError("Unexpected empty line")
 
-    match = first_pattern.fullmatch(text)
-
-    if match is None:
-        raise ValueError(f"Couldn't parse {text}")
+    entry = plain_entry_from_text(text, is_new)
+    if entry is not None:
+        return entry
 
-    prefix, left, separator, right = match.groups()
+    prefix, left, separator, value_quote, value, padding, comment = scan_entry(text)
 
     is_deleted = False
     is_updated = False
@@ -122,35 +479,24 @@ def entry_from_text(text, is_new=False):
 
     key_quote = ""
     key_string = left
-    if left[0] in ['"', "'"]:
+    if left[0] in QUOTES:
         if left[0] != left[-1]:
-            raise ValueError("Couldn't parse {left}: Incorrect quotes")
+            raise ValueError(f"Couldn't parse {left}: Incorrect quotes")
         key_quote = left[0]
         key_string = left[1:-1]
 
-    key = normalize_steno(key_string)
-
-    q = right[0]
-    if q == '"' or q == "'":
-        value_quote = q
-        right_match = right_quote_pattern[q].fullmatch(right)
-        if not right_match:
-            raise ValueError(f"Couldn't parse the right side of {text}")
-        value, padding, comment = right_match.groups()
+    key = stroke_cache.normalize(key_string)
 
+    if value_quote:
+        q = value_quote
         value = value.replace(f"\\{q}", q).replace("\\\\", "\\")
     else:
-        value_quote = ""
-        right_match = right_no_quote_pattern.fullmatch(right)
-        if not right_match:
-            raise ValueError(f"Couldn't parse the right side of {text}")
-        value, padding, comment = right_match.groups()
         for c in ["'", '"', "#", "\\"]:
             value = value.replace(f"\\{c}", c)
 
     value = value.replace("\\n", "\n").replace("\\r", "\r").replace("\\t", "\t")
 
-    return Entry(
+    entry = Entry(
         key=key,
         key_string=key_string,
         key_quote=key_quote,
@@ -159,103 +505,2088 @@ def entry_from_text(text, is_new=False):
         value_quote=value_quote,
         separator=separator,
         comment_padding=padding,
-        comment=comment or "",
+        comment=comment,
         is_deleted=is_deleted,
         is_new=is_new,
     )
+    # keep the line if it's what writing the entry gives (entries without any
+    # value can't be written)
+    if (entry.updated_value or entry.value) is not None and str(entry) == text:
+        entry.text = text
+    return entry
 
 
-ignored_code_block_start_pattern = re.compile(r"(```+)\w*\s*\n")
-code_block_start_pattern = re.compile(r"(```+)(?:yaml)?\s*\n")
+def definition_from_text(text):
+    """The key and translation of an entry line (``None`` if it's deleted),
+    without keeping an ``Entry`` for it."""
+    parts = split_plain_entry(text)
+    if parts is not None:
+        return stroke_cache.normalize(parts[0]), parts[1]
+    entry = entry_from_text(text)
+    return entry.key, None if entry.is_deleted else entry.updated_value
 
 
-class MarkdownDictionary(StenoDictionary):
+PROSE = "prose"
+CODE_BLOCK = "code block"
+IGNORED_CODE_BLOCK = "ignored code block"
 
-    PLOVER_ADDS_TITLE = "## Added by Plover\n"
+# The state an opening fence moves to, by its info string. Any other info
+# string starts a code block that isn't part of the dictionary.
+FENCE_STATES = {"": CODE_BLOCK, "yaml": CODE_BLOCK}
 
-    def __init__(self):
-        super().__init__()
-        self.rich_lines = []
-        self.plover_adds_section_end_index = None
 
-    def _load(self, filename):
-        with open(filename, "r") as f:
-            lines = f.readlines()
+def parse_fence(line):
+    """Return ``(ticks, info)`` if ``line`` opens a code block, else ``None``.
+
+    ``line`` needs at least three backticks, then an optional word, then only
+    whitespace.
+    """
+    if not line.startswith("```") or line[-1] != "\n":
+        return None
+    rest = line.lstrip("`")
+    info = rest.rstrip()
+    if info and not info.replace("_", "a").isalnum():
+        return None
+    return line[: len(line) - len(rest)], info
+
+
+def closes_fence(line, ticks):
+    """Whether ``line`` closes a code block that was opened with ``ticks``."""
+    rest = line[len(ticks) :]
+    return line.startswith(ticks) and rest[-1:] == "\n" and rest.isspace()
+
+
+PLOVER_ADDS_TITLE = "## Added by Plover\n"
+
+
+class RichLineParser:
+    """Turns lines of markdown into ``Prose`` and ``Entry`` objects.
+
+    Iterating over the parser reads ``lines`` (any iterable of strings ending
+    in newlines, like an open file) one at a time. Once it's exhausted,
+    ``plover_adds_section_end_index`` is the index of the line where new
+    entries should go, if the file ends with an "Added by Plover" section,
+    and ``code_blocks`` lists the ``(start, end, fingerprint)`` of each
+    non-empty code block, where ``start:end`` is the slice of its entries and
+    ``fingerprint`` is a hash of their text.
+
+    Each line in a code block is passed to ``parse_entry``.
+    """
 
-        in_code_block = None
-        in_ignored_code_block = None
+    def __init__(
+        self, lines, adds_title=PLOVER_ADDS_TITLE, parse_entry=entry_from_text
+    ):
+        self.lines = lines
+        self.adds_title = adds_title
+        self.parse_entry = parse_entry
+        self.plover_adds_section_end_index = None
+        self.code_blocks = []
+
+    def __iter__(self):
+        state = PROSE
+        ticks = None
         in_adds_section = False
+        line_count = 0
+        block_start = None
+        fingerprint = None
 
-        for i, line in enumerate(lines):
+        for i, line in enumerate(self.lines):
             try:
-                if in_code_block:
-                    if re.fullmatch(rf"{in_code_block}\s*\n", line):
+                if state is CODE_BLOCK:
+                    # only lines starting with a backtick can close the block
+                    if line[0] == "`" and closes_fence(line, ticks):
                         if in_adds_section:
                             if self.plover_adds_section_end_index:
                                 in_adds_section = False
                                 self.plover_adds_section_end_index = None
                             else:
-                                self.plover_adds_section_end_index = len(
-                                    self.rich_lines
-                                )
+                                self.plover_adds_section_end_index = line_count
 
-                        in_code_block = False
-                        self.rich_lines.append(Prose(line))
+                        state = PROSE
+                        rich_line = Prose(line)
+                        if line_count > block_start:
+                            self.code_blocks.append(
+                                (block_start, line_count, fingerprint.digest())
+                            )
                     else:
-                        self.rich_lines.append(entry_from_text(line))
-                    continue
+                        rich_line = self.parse_entry(line)
+                        fingerprint.update(line.encode())
+                else:
+                    rich_line = Prose(line)
+                    if line == self.adds_title:
+                        in_adds_section = True
+                        self.plover_adds_section_end_index = None
+
+                    if line[0] == "`":
+                        if state is IGNORED_CODE_BLOCK:
+                            if closes_fence(line, ticks):
+                                state = PROSE
+                        else:
+                            fence = parse_fence(line)
+                            if fence:
+                                ticks, info = fence
+                                state = FENCE_STATES.get(info, IGNORED_CODE_BLOCK)
+                                if state is CODE_BLOCK:
+                                    block_start = line_count + 1
+                                    fingerprint = hashlib.blake2b(digest_size=16)
+            except Exception as e:
+                raise Exception(f"Problem on line {i}: '{line}'") from e
+
+            line_count += 1
+            yield rich_line
+
+        if state is not PROSE:
+            raise ValueError("Found unclosed code block(s) at end of file")
+
+
+def iter_rich_lines(fileobj):
+    """Yield a ``Prose`` or ``Entry`` for each line of a markdown dictionary.
+
+    Lines are read from ``fileobj`` as they're needed, so scanning a file this
+    way only holds one line in memory at a time.
+    """
+    yield from RichLineParser(fileobj)
+
 
-                self.rich_lines.append(Prose(line))
-                if line == self.PLOVER_ADDS_TITLE:
-                    in_adds_section = True
-                    self.plover_adds_section_end_index = None
+def iter_definitions(lines, parse_entry=definition_from_text):
+    """Yield ``(key, translation)`` for each entry in ``lines``, parsed by
+    ``parse_entry``.
 
-                if in_ignored_code_block:
-                    if re.fullmatch(rf"{in_ignored_code_block}\s*\n", line):
-                        in_ignored_code_block = None
+    The code blocks are found the same way as by ``RichLineParser``, but
+    nothing else about the lines is kept.
+    """
+    state = PROSE
+    ticks = None
+    for i, line in enumerate(lines):
+        definition = None
+        try:
+            if state is CODE_BLOCK:
+                if line[0] == "`" and closes_fence(line, ticks):
+                    state = PROSE
                 else:
-                    code_block_match = code_block_start_pattern.fullmatch(line)
-                    if code_block_match:
-                        (ticks,) = code_block_match.groups()
-                        in_code_block = ticks
-                    else:
-                        ignored_block_match = (
-                            ignored_code_block_start_pattern.fullmatch(line)
-                        )
-                        if ignored_block_match:
-                            (ticks,) = ignored_block_match.groups()
-                            in_ignored_code_block = ticks
+                    definition = parse_entry(line)
+            elif line[0] == "`":
+                if state is IGNORED_CODE_BLOCK:
+                    if closes_fence(line, ticks):
+                        state = PROSE
+                else:
+                    fence = parse_fence(line)
+                    if fence:
+                        ticks, info = fence
+                        state = FENCE_STATES.get(info, IGNORED_CODE_BLOCK)
+        except Exception as e:
+            raise Exception(f"Problem on line {i}: '{line}'") from e
+        if definition is not None:
+            yield definition
+
+    if state is not PROSE:
+        raise ValueError("Found unclosed code block(s) at end of file")
+
+
+def iter_text_lines(text, line_start):
+    """Yield the lines of ``text`` like reading them from a file, setting
+    ``line_start[0]`` to where each starts in ``text``."""
+    find = text.find
+    start = 0
+    size = len(text)
+    while start < size:
+        end = find("\n", start) + 1 or size
+        line_start[0] = start
+        yield text[start:end]
+        start = end
+
+
+class LazyValues(dict):
+    """A key to translation dict where a translation can be an ``int``, the
+    offset in ``text`` of the plain entry line it's in. The line is parsed
+    the first time the translation is looked up."""
+
+    def __init__(self, text):
+        super().__init__()
+        self.text = text
+
+    def parse(self, offset):
+        end = self.text.index("\n", offset) + 1
+        return split_plain_entry(self.text[offset:end])[1]
+
+    def decode(self, key, value):
+        if type(value) is int:
+            value = self.parse(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __getitem__(self, key):
+        return self.decode(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        value = dict.get(self, key)
+        if value is None:
+            return default
+        return self.decode(key, value)
+
+    def pop(self, key, *default):
+        value = dict.pop(self, key, *default)
+        if type(value) is int:
+            value = self.parse(value)
+        return value
+
+    def decode_all(self):
+        # only values change, so this doesn't upset iterating
+        for key, value in dict.items(self):
+            if type(value) is int:
+                self.decode(key, value)
+
+    def items(self):
+        self.decode_all()
+        return dict.items(self)
+
+    def values(self):
+        self.decode_all()
+        return dict.values(self)
+
+
+# A compiled dictionary is a header, the JSON of what it was compiled from,
+# the entries sorted by key, a hash index of the entries, and the pool of
+# UTF-8 keys and translations the entries point into. Keys are written as
+# strokes joined by "/", and numbers are little-endian.
+COMPILED_MAGIC = b"PMDC"
+COMPILED_VERSION = 1
+# magic, version, entry count, longest key, index slots, and the offsets of
+# the entries, index and pool, and the length of the source JSON
+COMPILED_HEADER = struct.Struct("<4sIIIIQQQI")
+# offset and length of the key and of the translation in the pool
+COMPILED_ENTRY = struct.Struct("<IIII")
+# 1 + the number of the entry in it, or 0 if it's empty
+COMPILED_SLOT = struct.Struct("<I")
+
+
+def write_compiled_dictionary(filename, items, source):
+    """Write the ``(key, translation)`` pairs ``items`` to ``filename`` for
+    ``CompiledDictionary``. ``source`` is anything JSON can store, to tell
+    what they were compiled from."""
+    entries = sorted(
+        ("/".join(key).encode(), value.encode(), len(key)) for key, value in items
+    )
+    longest_key = max((key_length for _, _, key_length in entries), default=0)
+    # at most half full, so lookups find a gap soon
+    slot_count = 1 << max(2 * len(entries) - 1, 0).bit_length()
+    mask = slot_count - 1
+    index = bytearray(COMPILED_SLOT.size * slot_count)
+    entry_table = bytearray()
+    pool = bytearray()
+    for number, (key_bytes, value_bytes, _) in enumerate(entries, 1):
+        entry_table += COMPILED_ENTRY.pack(
+            len(pool), len(key_bytes), len(pool) + len(key_bytes), len(value_bytes)
+        )
+        pool += key_bytes
+        pool += value_bytes
+        slot = zlib.crc32(key_bytes) & mask
+        while COMPILED_SLOT.unpack_from(index, slot * COMPILED_SLOT.size)[0]:
+            slot = (slot + 1) & mask
+        COMPILED_SLOT.pack_into(index, slot * COMPILED_SLOT.size, number)
+
+    source_bytes = json.dumps(source).encode()
+    entries_offset = COMPILED_HEADER.size + len(source_bytes)
+    index_offset = entries_offset + len(entry_table)
+    pool_offset = index_offset + len(index)
+    temp_path = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(
+                COMPILED_HEADER.pack(
+                    COMPILED_MAGIC,
+                    COMPILED_VERSION,
+                    len(entries),
+                    longest_key,
+                    slot_count,
+                    entries_offset,
+                    index_offset,
+                    pool_offset,
+                    len(source_bytes),
+                )
+            )
+            f.write(source_bytes)
+            f.write(entry_table)
+            f.write(index)
+            f.write(pool)
+        # other processes might have the old one open, and keep it
+        os.replace(temp_path, filename)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class CompiledDictionary:
+    """A read-only key to translation mapping written by
+    ``write_compiled_dictionary``, looked up in the file without parsing it.
+
+    The file is mapped into memory, so every process with it open shares
+    the same pages. It has the reading parts of a ``dict``'s interface, with
+    the keys in sorted order.
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (
+                magic,
+                version,
+                self.entry_count,
+                self.longest_key,
+                self.slot_count,
+                self.entries_offset,
+                self.index_offset,
+                self.pool_offset,
+                source_length,
+            ) = COMPILED_HEADER.unpack_from(self.mmap)
+            if magic != COMPILED_MAGIC or version != COMPILED_VERSION:
+                raise ValueError(f"{filename} isn't a compiled dictionary")
+            self.source = json.loads(
+                self.mmap[COMPILED_HEADER.size : self.entries_offset].decode()
+            )
+        except Exception:
+            self.mmap.close()
+            raise
+
+    def close(self):
+        self.mmap.close()
+
+    def entry(self, number):
+        """The key and translation of the entry ``number`` (from 0) as
+        ``bytes``."""
+        key_offset, key_length, value_offset, value_length = (
+            COMPILED_ENTRY.unpack_from(
+                self.mmap, self.entries_offset + number * COMPILED_ENTRY.size
+            )
+        )
+        pool_offset = self.pool_offset
+        key_offset += pool_offset
+        value_offset += pool_offset
+        return (
+            self.mmap[key_offset : key_offset + key_length],
+            self.mmap[value_offset : value_offset + value_length],
+        )
+
+    def find(self, key):
+        """The translation of ``key`` as ``bytes``, or ``None``."""
+        key_bytes = "/".join(key).encode()
+        data = self.mmap
+        mask = self.slot_count - 1
+        slot = zlib.crc32(key_bytes) & mask
+        while True:
+            (number,) = COMPILED_SLOT.unpack_from(
+                data, self.index_offset + slot * COMPILED_SLOT.size
+            )
+            if not number:
+                return None
+            key_offset, key_length, value_offset, value_length = (
+                COMPILED_ENTRY.unpack_from(
+                    data, self.entries_offset + (number - 1) * COMPILED_ENTRY.size
+                )
+            )
+            if key_length == len(key_bytes):
+                key_offset += self.pool_offset
+                if data[key_offset : key_offset + key_length] == key_bytes:
+                    value_offset += self.pool_offset
+                    return data[value_offset : value_offset + value_length]
+            slot = (slot + 1) & mask
+
+    def get(self, key, default=None):
+        value = self.find(key)
+        if value is None:
+            return default
+        return value.decode()
+
+    def __getitem__(self, key):
+        value = self.find(key)
+        if value is None:
+            raise KeyError(key)
+        return value.decode()
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def __len__(self):
+        return self.entry_count
+
+    def items(self):
+        for number in range(self.entry_count):
+            key, value = self.entry(number)
+            yield tuple(key.decode().split("/")), value.decode()
+
+    def __iter__(self):
+        for key, _ in self.items():
+            yield key
+
+    keys = __iter__
+
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+
+def compile_dictionary(filename, compiled_filename, source):
+    """Compile the markdown dictionary ``filename`` into
+    ``compiled_filename``, like ``write_compiled_dictionary``."""
+    definitions = {}
+    with open(filename, "r") as f:
+        for key, value in iter_definitions(f):
+            if value is not None:
+                definitions[key] = value
+    write_compiled_dictionary(compiled_filename, definitions.items(), source)
+
+
+def parse_reusing_code_blocks(
+    lines, adds_title, old_rich_lines, old_code_blocks, reusable=None
+):
+    """Parse ``lines`` like ``RichLineParser``, except that the entries of
+    code blocks with the fingerprint of one of ``old_code_blocks`` are taken
+    from ``old_rich_lines`` instead of being parsed again. If ``reusable``
+    is given, only the old code blocks at those indices are used.
+
+    Returns ``(rich_lines, parser, reused_blocks, parsed_keys)``, where
+    ``reused_blocks`` are the indices of the old code blocks used, in the
+    order they're used, and ``parsed_keys`` the keys of the entries that
+    were parsed.
+    """
+    if reusable is None:
+        reusable = range(len(old_code_blocks))
+    reusable_blocks = {}
+    for index in reversed(reusable):
+        fingerprint = old_code_blocks[index][2]
+        reusable_blocks.setdefault(fingerprint, []).append(index)
+
+    parser = RichLineParser(lines, adds_title, parse_entry=lambda line: line)
+    rich_lines = list(parser)
+
+    reused_blocks = []
+    parsed_keys = set()
+    for start, end, fingerprint in parser.code_blocks:
+        candidates = reusable_blocks.get(fingerprint)
+        if candidates:
+            index = candidates.pop()
+            old_start, old_end, _ = old_code_blocks[index]
+            rich_lines[start:end] = old_rich_lines[old_start:old_end]
+            reused_blocks.append(index)
+            continue
+
+        for i in range(start, end):
+            line = rich_lines[i]
+            try:
+                rich_lines[i] = entry_from_text(line)
             except Exception as e:
                 raise Exception(f"Problem on line {i}: '{line}'") from e
+            parsed_keys.add(rich_lines[i].key)
 
-        if in_code_block or in_ignored_code_block:
-            raise ValueError("Found unclosed code block(s) at end of file")
+    return rich_lines, parser, reused_blocks, parsed_keys
+
+
+def setup_parse_worker(system_name):
+    """Set up the steno system in a worker process, if it isn't already."""
+    if system.NAME != system_name:
+        registry.update()
+        system.setup(system_name)
+
+
+def parse_entry_chunk(chunk):
+    """Parse a list of ``(first_line_number, lines)`` runs into lists of
+    entries."""
+    parsed_runs = []
+    for first_line_number, lines in chunk:
+        entries = []
+        for i, line in enumerate(lines, first_line_number):
+            try:
+                entries.append(entry_from_text(line))
+            except Exception as e:
+                raise Exception(f"Problem on line {i}: '{line}'") from e
+        parsed_runs.append(entries)
+    return parsed_runs
+
+
+def parse_rich_lines_in_parallel(
+    lines, adds_title=PLOVER_ADDS_TITLE, max_workers=None, chunk_size=None
+):
+    """Parse ``lines`` like ``RichLineParser``, with entries parsed in a
+    process pool.
+
+    The code fences are found in this process first. The code blocks are then
+    grouped into chunks of about ``chunk_size`` lines (splitting big blocks)
+    which are parsed in parallel, and the entries are put back in order.
+    Returns ``(rich_lines, plover_adds_section_end_index, code_blocks)``.
+    """
+    # entry lines are left as strings until they're parsed
+    parser = RichLineParser(lines, adds_title, parse_entry=lambda line: line)
+    rich_lines = list(parser)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunk_size is None:
+        entry_count = sum(isinstance(line, str) for line in rich_lines)
+        chunk_size = max(1000, -(-entry_count // (max_workers * 4)))
+
+    chunks = []
+    chunk = []
+    chunk_line_count = 0
+    run_start = None
+    for i, rich_line in enumerate(chain(rich_lines, [None])):
+        is_entry = isinstance(rich_line, str)
+        if is_entry and run_start is None:
+            run_start = i
+        if run_start is not None and (
+            not is_entry or i - run_start + chunk_line_count == chunk_size
+        ):
+            chunk.append((run_start, rich_lines[run_start:i]))
+            chunk_line_count += i - run_start
+            run_start = i if is_entry else None
+        if chunk and (chunk_line_count == chunk_size or rich_line is None):
+            chunks.append(chunk)
+            chunk = []
+            chunk_line_count = 0
+
+    # Plover loads dictionaries on threads, and forking a process with threads
+    # can leave locks held in the child, so the workers start from scratch.
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=setup_parse_worker,
+        initargs=(system.NAME,),
+    ) as executor:
+        for chunk, parsed_runs in zip(
+            chunks, executor.map(parse_entry_chunk, chunks)
+        ):
+            for (run_start, _), entries in zip(chunk, parsed_runs):
+                rich_lines[run_start : run_start + len(entries)] = entries
+
+    return rich_lines, parser.plover_adds_section_end_index, parser.code_blocks
+
+
+def rich_line_to_row(rich_line):
+    """A plain tuple (or string, for prose) that pickles much faster."""
+    if rich_line.kind == "prose":
+        return rich_line.text
+    return (*(getattr(rich_line, name) for name in Entry.fields), rich_line._text)
+
+
+def rich_line_from_row(row):
+    if type(row) is str:
+        return Prose(row)
+    return Entry(*row)
+
+
+PICKLE_CHUNK_SIZE = 4096
+
+
+def write_pickled_chunks(f, items):
+    """Pickle ``items`` into ``f`` as lists of ``PICKLE_CHUNK_SIZE``, and an
+    empty list to end them, so they never all need to be in memory at once."""
+    items = iter(items)
+    chunk = list(islice(items, PICKLE_CHUNK_SIZE))
+    while chunk:
+        pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+        chunk = list(islice(items, PICKLE_CHUNK_SIZE))
+    pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_pickled_chunks(f):
+    """Yield the items written to ``f`` by ``write_pickled_chunks``."""
+    chunk = pickle.load(f)
+    while chunk:
+        yield from chunk
+        chunk = pickle.load(f)
+
+
+ENTRY_FLAG = 1
+NEW_FLAG = 2
+DELETED_FLAG = 4
+KEY_QUOTE_SHIFT = 3
+VALUE_QUOTE_SHIFT = 5
+QUOTE_CODES = {"": 0, '"': 1, "'": 2}
+QUOTE_CHARACTERS = ("", '"', "'")
+
+
+class ColumnarRichLines:
+    """``rich_lines`` stored as parallel columns instead of one object per
+    line.
 
-        self.update(
-            {
-                entry.key: entry.updated_value
-                for entry in self.rich_lines
-                if entry.kind == "entry" and not entry.is_deleted
-            }
+    ``flags`` packs each line's kind, ``is_new``, ``is_deleted`` and quote
+    styles into a byte. ``keys``, ``values`` and ``updated_values`` hold the
+    entries' keys and translations, which are the same objects the
+    dictionary holds. ``extras`` indexes ``pool``: the text of prose lines,
+    and for entries a ``(key_string, separator, comment_padding, comment)``
+    tuple (with ``key_string`` ``None`` if it's the same as the key), which
+    is stored once for all lines that share it.
+
+    Indexing returns an ``EntryView`` or ``ProseView``, created on access,
+    which reads and writes the columns. Views are only valid until lines are
+    inserted or removed before them.
+    """
+
+    def __init__(self, rich_lines=()):
+        self.flags = bytearray()
+        self.keys = []
+        self.values = []
+        self.updated_values = []
+        self.extras = array("I")
+        self.pool = []
+        self.pool_indices = {}
+        self.extend(rich_lines)
+
+    def pool_index(self, item):
+        index = self.pool_indices.get(item)
+        if index is None:
+            index = self.pool_indices[item] = len(self.pool)
+            self.pool.append(item)
+        return index
+
+    def columns(self, rich_line):
+        """Return ``(flags, key, value, updated_value, extra)`` for a line."""
+        if rich_line.kind == "prose":
+            flags = NEW_FLAG if rich_line.is_new else 0
+            return flags, None, None, None, self.pool_index(rich_line.text)
+
+        key_string = rich_line.key_string
+        if key_string == "/".join(rich_line.key):
+            key_string = None
+        flags = (
+            ENTRY_FLAG
+            | (NEW_FLAG if rich_line.is_new else 0)
+            | (DELETED_FLAG if rich_line.is_deleted else 0)
+            | QUOTE_CODES[rich_line.key_quote] << KEY_QUOTE_SHIFT
+            | QUOTE_CODES[rich_line.value_quote] << VALUE_QUOTE_SHIFT
+        )
+        extra = self.pool_index(
+            (
+                key_string,
+                rich_line.separator,
+                rich_line.comment_padding,
+                rich_line.comment,
+            )
+        )
+        return flags, rich_line.key, rich_line.value, rich_line.updated_value, extra
+
+    def append(self, rich_line):
+        flags, key, value, updated_value, extra = self.columns(rich_line)
+        self.flags.append(flags)
+        self.keys.append(key)
+        self.values.append(value)
+        self.updated_values.append(updated_value)
+        self.extras.append(extra)
+
+    def extend(self, rich_lines):
+        for rich_line in rich_lines:
+            self.append(rich_line)
+
+    def __len__(self):
+        return len(self.flags)
+
+    def __eq__(self, other):
+        if not isinstance(other, (ColumnarRichLines, list)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            a == b for a, b in zip(self, other)
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self.line_index(index)
+        if self.flags[index] & ENTRY_FLAG:
+            return EntryView(self, index)
+        return ProseView(self, index)
+
+    def __iter__(self):
+        flags = self.flags
+        for index in range(len(flags)):
+            if flags[index] & ENTRY_FLAG:
+                yield EntryView(self, index)
+            else:
+                yield ProseView(self, index)
+
+    def copy(self):
+        rich_lines = ColumnarRichLines()
+        rich_lines.flags = bytearray(self.flags)
+        rich_lines.keys = self.keys.copy()
+        rich_lines.values = self.values.copy()
+        rich_lines.updated_values = self.updated_values.copy()
+        rich_lines.extras = array("I", self.extras)
+        rich_lines.pool = self.pool.copy()
+        rich_lines.pool_indices = self.pool_indices.copy()
+        return rich_lines
+
+    def __setitem__(self, index, rich_lines):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("extended slices aren't supported")
+            stop = max(start, stop)
+        else:
+            start = self.line_index(index)
+            stop = start + 1
+            rich_lines = [rich_lines]
+
+        # read everything first, as the lines could be views of this store
+        columns = [self.columns(rich_line) for rich_line in rich_lines]
+        flags, keys, values, updated_values, extras = (
+            zip(*columns) if columns else ((), (), (), (), ())
         )
+        self.flags[start:stop] = bytes(flags)
+        self.keys[start:stop] = keys
+        self.values[start:stop] = values
+        self.updated_values[start:stop] = updated_values
+        self.extras[start:stop] = array("I", extras)
+
+    def line_index(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("rich line index out of range")
+        return index
+
+
+def flag_property(flag):
+    def get(self):
+        return bool(self.store.flags[self.index] & flag)
+
+    def set(self, value):
+        if value:
+            self.store.flags[self.index] |= flag
+        else:
+            self.store.flags[self.index] &= ~flag
+
+    return property(get, set)
+
+
+def column_property(column):
+    def get(self):
+        return getattr(self.store, column)[self.index]
+
+    def set(self, value):
+        getattr(self.store, column)[self.index] = value
+
+    return property(get, set)
+
+
+def quote_property(shift):
+    def get(self):
+        return QUOTE_CHARACTERS[self.store.flags[self.index] >> shift & 3]
+
+    return property(get)
+
+
+def extra_property(position):
+    def get(self):
+        return self.store.pool[self.store.extras[self.index]][position]
+
+    return property(get)
+
+
+class ProseView:
+    """A ``Prose`` line in a ``ColumnarRichLines``."""
+
+    kind = "prose"
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def text(self):
+        return self.store.pool[self.store.extras[self.index]]
+
+    is_new = flag_property(NEW_FLAG)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"ProseView(text={self.text!r}, is_new={self.is_new!r})"
+
+    def __eq__(self, other):
+        if getattr(other, "kind", None) != "prose":
+            return NotImplemented
+        return self.text == other.text and self.is_new == other.is_new
+
+
+class EntryView:
+    """An ``Entry`` line in a ``ColumnarRichLines``."""
+
+    kind = "entry"
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    key = column_property("keys")
+    value = column_property("values")
+    updated_value = column_property("updated_values")
+    is_new = flag_property(NEW_FLAG)
+    is_deleted = flag_property(DELETED_FLAG)
+    key_quote = quote_property(KEY_QUOTE_SHIFT)
+    value_quote = quote_property(VALUE_QUOTE_SHIFT)
+    separator = extra_property(1)
+    comment_padding = extra_property(2)
+    comment = extra_property(3)
+
+    @property
+    def key_string(self):
+        key_string = self.store.pool[self.store.extras[self.index]][0]
+        if key_string is None:
+            return "/".join(self.key)
+        return key_string
+
+    # columnar lines are always written from their fields
+    _text = None
+
+    @property
+    def text(self):
+        return str(self)
+
+    @text.setter
+    def text(self, text):
+        pass
+
+    __str__ = Entry.__str__
+    is_updated = Entry.is_updated
+
+    def __repr__(self):
+        return "EntryView({})".format(
+            ", ".join(f"{name}={getattr(self, name)!r}" for name in Entry.fields)
+        )
+
+    def __eq__(self, other):
+        if getattr(other, "kind", None) != "entry":
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in Entry.fields
+        )
+
+
+# Dictionaries load on their own threads, so pausing the collector is counted:
+# the first pause turns it off (if it was on) and the last one turns it back on.
+gc_pause_lock = threading.Lock()
+gc_pause_depth = 0
+gc_pause_enable = False
+
+
+@contextmanager
+def gc_paused():
+    """Don't collect garbage in the block. Loading makes many objects that
+    all stay alive, and the collector would go over them again and again."""
+    global gc_pause_depth, gc_pause_enable
+    with gc_pause_lock:
+        if gc_pause_depth == 0:
+            gc_pause_enable = gc.isenabled()
+            gc.disable()
+        gc_pause_depth += 1
+    try:
+        yield
+    finally:
+        with gc_pause_lock:
+            gc_pause_depth -= 1
+            if gc_pause_depth == 0 and gc_pause_enable:
+                gc.enable()
+
+
+def file_signature(filename):
+    """``(size, mtime_ns, hash)`` of a file, to tell if it has changed."""
+    with open(filename, "rb") as f:
+        stat = os.fstat(f.fileno())
+        content_hash = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    return stat.st_size, stat.st_mtime_ns, content_hash
+
+
+def file_stat(filename):
+    """``(path, size, mtime_ns)`` of a file, to tell if it's been changed
+    since it was read or written."""
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+
+def line_offsets(texts, start=0, encoding=None):
+    """The byte offset of each line written from ``start``, and of the end."""
+    encoding = encoding or locale.getpreferredencoding(False)
+    return list(
+        accumulate(chain((start,), (len(text.encode(encoding)) for text in texts)))
+    )
+
+
+class SharedParse:
+    """What a dictionary's load made, shared with the other dictionaries
+    that load the same file through ``load_cache``. None of it is changed:
+    a dictionary copies what it changes."""
+
+    __slots__ = (
+        "mapping",
+        "reverse",
+        "casereverse",
+        "longest_key",
+        "rich_lines",
+        "plover_adds_section_end_index",
+        "code_blocks",
+        "key_lines",
+        "dirty_keys",
+        "new_keys",
+        "lines_match_file",
+        "__weakref__",
+    )
+
+    def __init__(self, dictionary):
+        self.mapping = dictionary._dict
+        self.reverse = dictionary.reverse
+        self.casereverse = dictionary.casereverse
+        self.longest_key = dictionary._longest_key
+        self.rich_lines = dictionary.rich_lines
+        self.plover_adds_section_end_index = dictionary.plover_adds_section_end_index
+        self.code_blocks = dictionary.code_blocks
+        self.key_lines = dictionary.key_lines
+        self.dirty_keys = frozenset(dictionary.dirty_keys)
+        self.new_keys = dict(dictionary.new_keys)
+        self.lines_match_file = dictionary.lines_match_file
+
+
+class LoadCache:
+    """Dictionaries parsed in this process, so that loading an unchanged
+    file again (Plover makes new dictionaries when its config is reloaded or
+    dictionaries are toggled) shares what was parsed instead of parsing it
+    again.
+
+    A parse is stored under a key starting with the file's resolved path,
+    with the file's ``(size, mtime_ns)`` when it was read (or ``None`` if
+    they can't be trusted), and only shared while the file still has them.
+    Once the file has changed, ``previous`` still gives it, so that its
+    unchanged code blocks can be reused. It's kept for as long as a dictionary
+    shares it. Once none does, only the most recently used are kept, up to
+    a total size of their files of ``max_size`` bytes.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        # key: (signature, weak reference to the parse)
+        self.parses = {}
+        # key: (size, parse) of the ones kept anyway, least recently used
+        # first
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, signature):
+        with self.lock:
+            cached = self.parses.get(key)
+            if cached is None:
+                return None
+            parse = cached[1]()
+            if parse is None:
+                # no longer used
+                self._remove(key)
+                return None
+            if cached[0] is None or cached[0] != signature:
+                # the file has changed since, but previous() can use it
+                return None
+            if key in self.recent:
+                self.recent.move_to_end(key)
+            return parse
+
+    def previous(self, key):
+        """The last parse stored under ``key``, even if the file has changed
+        since."""
+        with self.lock:
+            cached = self.parses.get(key)
+            return None if cached is None else cached[1]()
+
+    def put(self, key, signature, size, parse):
+        with self.lock:
+            self._remove(key)
+            for old_key, (_, ref) in list(self.parses.items()):
+                if ref() is None:
+                    del self.parses[old_key]
+            self.parses[key] = (signature, weakref.ref(parse))
+            if size > self.max_size:
+                return
+            self.recent[key] = (size, parse)
+            self.size += size
+            while self.size > self.max_size:
+                _, (old_size, _) = self.recent.popitem(last=False)
+                self.size -= old_size
+
+    def _remove(self, key):
+        self.parses.pop(key, None)
+        recent = self.recent.pop(key, None)
+        if recent is not None:
+            self.size -= recent[0]
+
+    def clear(self):
+        with self.lock:
+            self.parses.clear()
+            self.recent.clear()
+            self.size = 0
+
+
+# A parse takes about 30 times the size of its file in memory, so this keeps
+# at most about 30MiB that no dictionary is using.
+LOAD_CACHE_SIZE = 1024 * 1024
+load_cache = LoadCache(LOAD_CACHE_SIZE)
+
+
+WRITE_CHUNK_LINES = 4096
+
+
+def write_lines_atomically(filename, lines):
+    """Write ``lines`` to a temporary file next to ``filename``, and move it
+    over ``filename`` once it's on disk, so that a crash never leaves a half
+    written file.
+
+    The lines are joined and written a chunk at a time, rather than joined
+    into one string the size of the file.
+    """
+    temp_path = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "w") as f:
+            lines = iter(lines)
+            chunk = "".join(islice(lines, WRITE_CHUNK_LINES))
+            while chunk:
+                f.write(chunk)
+                chunk = "".join(islice(lines, WRITE_CHUNK_LINES))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            shutil.copymode(filename, temp_path)
+        except OSError:
+            # it's a new file
+            pass
+        os.replace(temp_path, filename)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def merge_changes(changes, later_changes):
+    """Combine the changes to save from ``MarkdownDictionary._take_changes``
+    with later ones."""
+    values, _ = changes
+    later_values, later_new_entries = later_changes
+    # the later new entries are all of them
+    return {**values, **later_values}, later_new_entries
+
+
+class MarkdownDictionary(StenoDictionary):
+
+    PLOVER_ADDS_TITLE = PLOVER_ADDS_TITLE
+
+    # Parse files of at least PARALLEL_LOAD_MIN_SIZE bytes in a pool of
+    # PARALLEL_LOAD_WORKERS processes (defaults to the number of CPUs).
+    PARALLEL_LOAD = False
+    PARALLEL_LOAD_MIN_SIZE = 4 * 1024 * 1024
+    PARALLEL_LOAD_WORKERS = None
+
+    # Keep the parsed file in PARSE_CACHE_DIR, and use that instead of parsing
+    # while the file is unchanged.
+    PARSE_CACHE = True
+    PARSE_CACHE_DIR = os.path.join(
+        appdirs.user_cache_dir("plover"), "markdown_dictionary"
+    )
+    PARSE_CACHE_VERSION = 4
+
+    # Share parses of unchanged files between the dictionaries of this
+    # process through load_cache. The dictionary, its reverse lookups and
+    # rich_lines are copied the first time they're changed. Files modified
+    # less than LOAD_CACHE_MIN_AGE seconds before they're read aren't
+    # shared, as they could be written again without changing their size or
+    # modification time. When a file has changed, its code blocks that
+    # haven't are taken from the last parse instead of being parsed again.
+    LOAD_CACHE = True
+    LOAD_CACHE_MIN_AGE = 2
+
+    # Load dictionaries that can't be written with only their keys and
+    # translations, leaving rich_lines as None, since they're never saved.
+    # If one is saved after all, rich_lines are parsed first.
+    LEAN_READONLY = False
+    # With LEAN_READONLY, also leave plain translations in the file's text
+    # until they're looked up, and build the reverse lookups the first time
+    # they're used (or the dictionary is changed).
+    LAZY_VALUES = False
+    # With LEAN_READONLY, look keys up in a CompiledDictionary of the file in
+    # PARSE_CACHE_DIR instead of loading it, compiling it first if the file
+    # has changed. Every process using it shares its memory.
+    COMPILED = False
+
+    # Store rich_lines as a ColumnarRichLines, which takes much less memory
+    # but is slower to work with.
+    COLUMNAR_RICH_LINES = False
+
+    # Save by writing only the part of the file that changed, in place,
+    # rather than a new copy of the whole file. A save that's interrupted
+    # leaves the file half written.
+    PATCH_SAVE = False
+
+    # Save on a thread, once there have been no saves for
+    # BACKGROUND_SAVE_DELAY seconds, so that a burst of changes is written
+    # once and the engine doesn't wait for it. Use flush() to write right
+    # away. The thread only runs while there's a save to write, and exiting
+    # waits for it.
+    BACKGROUND_SAVE = False
+    BACKGROUND_SAVE_DELAY = 0.5
+
+    # Write each change to a journal next to the file as it's made, instead
+    # of saving the file. save() only writes the file (and empties the
+    # journal) once the journal is JOURNAL_MAX_SIZE bytes or
+    # JOURNAL_MAX_AGE seconds old, or on compact(). A journal is always
+    # applied when loading.
+    JOURNAL = False
+    JOURNAL_MAX_SIZE = 1024 * 1024
+    JOURNAL_MAX_AGE = 10 * 60
+
+    def __init__(self):
+        super().__init__()
+        self.rich_lines = self._new_rich_lines(())
+        self.plover_adds_section_end_index = None
+        # The positions of each key's entries in rich_lines (not counting
+        # lines added by saving), and the keys that have none, in order.
+        self.key_lines = {}
+        self.new_keys = {}
+        # Keys whose entries might not match the dictionary, and where the
+        # lines added by the last save are.
+        self.dirty_keys = set()
+        self.added_lines = None
+        # For patching: the file as it was last loaded or saved, whether its
+        # lines are the text of rich_lines, and their byte offsets.
+        self.file_stat = None
+        self.lines_match_file = False
+        self.line_offsets = None
+        # For saving in the background: the save waiting to be written, when
+        # it was last asked for, and the thread writing it. write_lock is
+        # held while writing.
+        self.save_condition = threading.Condition()
+        self.pending_save = None
+        self.save_requested_at = None
+        self.save_now = False
+        self.save_thread = None
+        self.write_lock = threading.Lock()
+        # For the journal: the file it's being written to, its size, when its
+        # first change was written, and whether it's being applied.
+        self.journal = None
+        self.journal_size = 0
+        self.journal_started_at = None
+        self.replaying_journal = False
+        # For reloading: the code blocks as they were loaded, the ones whose
+        # entries have been changed by saving since, and keys edited since.
+        self.code_blocks = None
+        self.modified_code_blocks = set()
+        self.edited_keys = set()
+        # The SharedParse from load_cache this dictionary uses, and whether
+        # the dictionary and reverse lookups, and rich_lines, are still the
+        # ones in it, and have to be copied to be changed.
+        self.shared_parse = None
+        self.shared_values = False
+        self.shared_rich_lines = False
+
+    def __setitem__(self, key, value):
+        self._own_values()
+        if key in self._dict:
+            # rather than through __delitem__, which would journal it
+            StenoDictionary.__delitem__(self, key)
+            self.new_keys.pop(key, None)
+        super().__setitem__(key, value)
+        self.edited_keys.add(key)
+        self.dirty_keys.add(key)
+        if key not in self.key_lines:
+            self.new_keys[key] = None
+        if self.JOURNAL and not self.replaying_journal:
+            self._write_journal(["/".join(key), value])
+
+    def __delitem__(self, key):
+        self._own_values()
+        super().__delitem__(key)
+        self.edited_keys.add(key)
+        self.dirty_keys.add(key)
+        self.new_keys.pop(key, None)
+        if self.JOURNAL and not self.replaying_journal:
+            self._write_journal(["/".join(key)])
+
+    def update(self, *args, **kwargs):
+        self._own_values()
+        if self._dict:
+            # goes through __setitem__
+            super().update(*args, **kwargs)
+        else:
+            super().update(*args, **kwargs)
+            self.edited_keys.update(self._dict)
+            self.dirty_keys.update(self._dict)
+            self._find_new_keys()
+            if self.JOURNAL and not self.replaying_journal:
+                self._write_journal(
+                    *(["/".join(key), value] for key, value in self._dict.items())
+                )
+
+    def clear(self):
+        self.edited_keys.update(self._dict)
+        self.dirty_keys.update(self._dict)
+        if type(self._dict) is not dict or self.shared_values:
+            self._dict = {}
+            self.reverse = defaultdict(list)
+            self.casereverse = defaultdict(list)
+            self.shared_values = False
+            self._release_shared_parse()
+        super().clear()
+        self.new_keys = {}
+        if self.JOURNAL and not self.replaying_journal:
+            self._write_journal([])
+
+    def reverse_lookup(self, value):
+        self._decode_values()
+        return super().reverse_lookup(value)
+
+    def casereverse_lookup(self, value):
+        self._decode_values()
+        return super().casereverse_lookup(value)
+
+    def apply_changes(self, adds=(), updates=(), deletes=()):
+        """Add, update and delete many entries at once, then save.
+
+        ``adds`` and ``updates`` map keys to translations, and ``deletes``
+        is the keys to delete. Keys to add mustn't be in the dictionary, and
+        keys to update or delete must be. If any change isn't valid, nothing
+        is changed and a ``ValueError`` is raised.
+
+        Returns a dictionary of the keys ``"added"``, ``"updated"``,
+        ``"deleted"``, and ``"unchanged"`` (updated to the same translation).
+        """
+        assert not self.readonly
+        self._own_values()
+        adds = dict(adds)
+        updates = dict(updates)
+        deletes = list(deletes)
+
+        problems = []
+        seen = set()
+        for changes, must_exist in (
+            (adds, False),
+            (updates, True),
+            (deletes, True),
+        ):
+            for key in changes:
+                if (
+                    not isinstance(key, tuple)
+                    or not key
+                    or not all(isinstance(stroke, str) for stroke in key)
+                ):
+                    problems.append(f"{key!r} isn't a key")
+                elif key in seen:
+                    problems.append(f"{key!r} is changed more than once")
+                elif (key in self._dict) != must_exist:
+                    problems.append(
+                        f"{key!r} is already in the dictionary"
+                        if key in self._dict
+                        else f"{key!r} isn't in the dictionary"
+                    )
+                seen.add(key)
+        for key, value in chain(adds.items(), updates.items()):
+            if not isinstance(value, str):
+                problems.append(f"{value!r} for {key!r} isn't a translation")
+        if problems:
+            raise ValueError("Invalid changes: " + "; ".join(problems))
+
+        unchanged = [key for key, value in updates.items() if self._dict[key] == value]
+        for key in unchanged:
+            del updates[key]
+        changed_keys = seen.difference(unchanged)
+
+        reverse = self.reverse
+        casereverse = self.casereverse
+        new_keys = self.new_keys
+        key_lines = self.key_lines
+        longest_key = self._longest_key
+        recompute_longest_key = False
+        for key in chain(deletes, updates):
+            value = self._dict.pop(key)
+            reverse[value].remove(key)
+            casereverse[value.lower()].remove(value)
+            new_keys.pop(key, None)
+            if len(key) == longest_key:
+                recompute_longest_key = True
+        # like __setitem__, updated keys go to the end
+        for key, value in chain(updates.items(), adds.items()):
+            self._dict[key] = value
+            reverse[value].append(key)
+            casereverse[value.lower()].append(value)
+            if key not in key_lines:
+                new_keys[key] = None
+        if recompute_longest_key:
+            self._longest_key = max(map(len, self._dict), default=0)
+        else:
+            self._longest_key = max(
+                chain((longest_key,), map(len, updates), map(len, adds))
+            )
+
+        self.edited_keys.update(changed_keys)
+        self.dirty_keys.update(changed_keys)
+        if self.JOURNAL and not self.replaying_journal:
+            self._write_journal(
+                *(["/".join(key)] for key in deletes),
+                *(
+                    ["/".join(key), value]
+                    for key, value in chain(updates.items(), adds.items())
+                ),
+            )
+        if self.path is not None:
+            self.save()
+
+        return {
+            "added": list(adds),
+            "updated": list(updates),
+            "deleted": deletes,
+            "unchanged": unchanged,
+        }
+
+    def _load(self, filename):
+        if self.LEAN_READONLY and not os.access(filename, os.W_OK):
+            self._load_definitions(filename)
+            return
+
+        stat = file_stat(filename)
+        with gc_paused():
+            if not self._read_load_cache(filename, stat):
+                if self.PARSE_CACHE:
+                    signature = file_signature(filename)
+                    if not self._read_parse_cache(filename, signature):
+                        if not self._reparse(filename):
+                            self._parse(filename)
+                        self._write_parse_cache(filename, signature)
+                elif not self._reparse(filename):
+                    self._parse(filename)
+
+                # every key has an entry, so none are new
+                self._index_rich_lines()
+                self._write_load_cache(filename, stat)
+        self.file_stat = stat
+        self.modified_code_blocks = set()
+        self.edited_keys = set()
+        self._replay_journal(filename)
+
+    def _parse(self, filename):
+        if (
+            self.PARALLEL_LOAD
+            and os.path.getsize(filename) >= self.PARALLEL_LOAD_MIN_SIZE
+        ):
+            with open(filename, "r") as f:
+                (
+                    rich_lines,
+                    self.plover_adds_section_end_index,
+                    self.code_blocks,
+                ) = parse_rich_lines_in_parallel(
+                    f, self.PLOVER_ADDS_TITLE, self.PARALLEL_LOAD_WORKERS
+                )
+            self.rich_lines = self._new_rich_lines(
+                self._insert_entries(rich_lines)
+            )
+        else:
+            with open(filename, "r") as f:
+                parser = RichLineParser(f, self.PLOVER_ADDS_TITLE)
+                self.rich_lines = self._new_rich_lines(
+                    self._insert_entries(parser)
+                )
+            self.plover_adds_section_end_index = (
+                parser.plover_adds_section_end_index
+            )
+            self.code_blocks = parser.code_blocks
+
+    def _reparse(self, filename):
+        """Parse the file reusing the unchanged code blocks of the last parse
+        of it in ``load_cache``, if there is one, and return whether there
+        was."""
+        if not self.LOAD_CACHE:
+            return False
+        previous = load_cache.previous(self._load_cache_key(filename))
+        if previous is None:
+            return False
+        with open(filename, "r") as f:
+            rich_lines, parser, _, _ = parse_reusing_code_blocks(
+                f,
+                self.PLOVER_ADDS_TITLE,
+                previous.rich_lines,
+                previous.code_blocks,
+            )
+        self.rich_lines = self._new_rich_lines(self._insert_entries(rich_lines))
+        self.plover_adds_section_end_index = parser.plover_adds_section_end_index
+        self.code_blocks = parser.code_blocks
+        return True
+
+    def _load_definitions(self, filename):
+        compiled = None
+        if self.COMPILED:
+            try:
+                compiled = self.open_compiled(filename)
+            except OSError:
+                # the compiled file is only an optimization
+                pass
+        if compiled is not None:
+            self._dict = compiled
+            self._longest_key = compiled.longest_key
+        else:
+            with gc_paused():
+                with open(filename, "r") as f:
+                    if self.LAZY_VALUES:
+                        self._load_lazy_definitions(f.read())
+                    else:
+                        self._insert_definitions(iter_definitions(f))
+        self.rich_lines = None
+        self.shared_rich_lines = False
+        self._release_shared_parse()
+        self.plover_adds_section_end_index = None
+        self.code_blocks = None
+        self.key_lines = {}
+        self.new_keys = {}
+        self.dirty_keys = set()
+        self.added_lines = None
+        self.file_stat = None
+        self.lines_match_file = False
+        self.line_offsets = None
+        self.modified_code_blocks = set()
+        self.edited_keys = set()
+        self._replay_journal(filename)
+
+    def _insert_definitions(self, definitions):
+        """Add ``(key, translation)`` pairs to the dictionary, like
+        ``_insert_entries``."""
+        mapping = self._dict
+        reverse = self.reverse
+        casereverse = self.casereverse
+        longest_key = self._longest_key
+        for key, value in definitions:
+            if value is None:
+                continue
+            old_value = mapping.get(key)
+            if old_value is not None:
+                reverse[old_value].remove(key)
+                casereverse[old_value.lower()].remove(old_value)
+            elif len(key) > longest_key:
+                longest_key = self._longest_key = len(key)
+            mapping[key] = value
+            reverse[value].append(key)
+            casereverse[value.lower()].append(value)
+
+    def _load_lazy_definitions(self, text):
+        line_start = [0]
+
+        def parse_entry(line):
+            parts = split_plain_entry(line)
+            if parts is None:
+                return definition_from_text(line)
+            return stroke_cache.normalize(parts[0]), line_start[0]
+
+        mapping = self._dict = LazyValues(text)
+        longest_key = self._longest_key
+        for key, value in iter_definitions(
+            iter_text_lines(text, line_start), parse_entry
+        ):
+            if value is None:
+                continue
+            if len(key) > longest_key:
+                longest_key = self._longest_key = len(key)
+            mapping[key] = value
+
+    def _decode_values(self):
+        """Turn a ``LazyValues`` or ``CompiledDictionary`` from a lean load
+        into a ``dict``, and build the reverse lookups."""
+        if type(self._dict) is not dict:
+            mapping = self._dict
+            self._dict = {}
+            self._insert_definitions(mapping.items())
+
+    def _own_values(self):
+        """Make the dictionary and its reverse lookups this dictionary's own
+        to change: copy them if they're shared with ``load_cache``, or
+        decode them if they're from a lean load."""
+        self._decode_values()
+        if self.shared_values:
+            with gc_paused():
+                self._dict = dict(self._dict)
+                self.reverse = defaultdict(
+                    list,
+                    {value: keys.copy() for value, keys in self.reverse.items()},
+                )
+                self.casereverse = defaultdict(
+                    list,
+                    {
+                        value: values.copy()
+                        for value, values in self.casereverse.items()
+                    },
+                )
+            self.shared_values = False
+            self._release_shared_parse()
+
+    def _own_rich_lines(self):
+        """Copy ``rich_lines`` if they're shared with ``load_cache``. The
+        entries in a list of them stay shared, so ``_write`` replaces them
+        rather than changing them."""
+        if self.shared_rich_lines:
+            self.rich_lines = self.rich_lines.copy()
+            self.shared_rich_lines = False
+            self._release_shared_parse()
+
+    def _release_shared_parse(self):
+        """Let go of the ``SharedParse`` once nothing in it is used, so
+        ``load_cache`` only keeps it if another dictionary does."""
+        if not (self.shared_values or self.shared_rich_lines):
+            self.shared_parse = None
+
+    def _load_rich_lines(self, filename):
+        """Parse ``rich_lines`` for a dictionary loaded without them, so it
+        can be saved. The dictionary stays as it is, and its keys that don't
+        match the file are saved."""
+        try:
+            stat = file_stat(filename)
+            with gc_paused():
+                with open(filename, "r") as f:
+                    parser = RichLineParser(f, self.PLOVER_ADDS_TITLE)
+                    self.rich_lines = self._new_rich_lines(parser)
+            self.plover_adds_section_end_index = (
+                parser.plover_adds_section_end_index
+            )
+            self.code_blocks = parser.code_blocks
+        except FileNotFoundError:
+            stat = None
+            self.rich_lines = self._new_rich_lines(())
+            self.plover_adds_section_end_index = None
+            self.code_blocks = []
+        self.shared_rich_lines = False
+        self._release_shared_parse()
+        self._index_rich_lines()
+        self.file_stat = stat
+
+    def _insert_entries(self, rich_lines):
+        """Yield ``rich_lines``, adding their entries to the dictionary, its
+        reverse lookups and ``longest_key`` on the way, so they're built as
+        the file is parsed rather than in other passes over it. Later
+        definitions of a key replace earlier ones."""
+        mapping = self._dict
+        reverse = self.reverse
+        casereverse = self.casereverse
+        longest_key = self._longest_key
+        for rich_line in rich_lines:
+            if rich_line.kind == "entry" and not rich_line.is_deleted:
+                key = rich_line.key
+                value = rich_line.updated_value
+                old_value = mapping.get(key)
+                if old_value is not None:
+                    reverse[old_value].remove(key)
+                    casereverse[old_value.lower()].remove(old_value)
+                elif len(key) > longest_key:
+                    longest_key = self._longest_key = len(key)
+                mapping[key] = value
+                reverse[value].append(key)
+                casereverse[value.lower()].append(value)
+            yield rich_line
+
+    def reload(self, filename=None):
+        """Load the file again into this dictionary, only parsing the code
+        blocks that changed.
+
+        Code blocks are matched to the ones from the last load by
+        fingerprint, and their entries are reused unless saving has changed
+        them. Only the keys in changed code blocks, or edited since the last
+        load, are updated in the dictionary.
+
+        Plover doesn't call this: it loads a changed file into a new
+        dictionary, which reuses code blocks through ``load_cache`` instead
+        (see ``_reparse``).
+        """
+        if filename is None:
+            filename = resource_filename(self.path)
+        self.flush()
+        if self.code_blocks is None:
+            self.clear()
+            self._load(filename)
+            return
+
+        stat = file_stat(filename)
+
+        # lines added by saving aren't part of the loaded code blocks
+        old_rich_lines = [line for line in self.rich_lines if not line.is_new]
+        reusable = [
+            index
+            for index in range(len(self.code_blocks))
+            if index not in self.modified_code_blocks
+        ]
+        with open(filename, "r") as f:
+            (
+                rich_lines,
+                parser,
+                reused_blocks,
+                parsed_keys,
+            ) = parse_reusing_code_blocks(
+                f,
+                self.PLOVER_ADDS_TITLE,
+                old_rich_lines,
+                self.code_blocks,
+                reusable,
+            )
+        changed_keys = parsed_keys | self.edited_keys
+
+        # Keys in code blocks that are gone may now be defined elsewhere (or
+        # not at all). If blocks have moved around, a different duplicate of
+        # a key might come last.
+        in_order = reused_blocks == sorted(reused_blocks)
+        reused_blocks = set(reused_blocks)
+        for index, (start, end, _) in enumerate(self.code_blocks):
+            if not in_order or index not in reused_blocks:
+                changed_keys.update(
+                    entry.key for entry in old_rich_lines[start:end]
+                )
+
+        values = {}
+        for entry in rich_lines:
+            if (
+                entry.kind == "entry"
+                and not entry.is_deleted
+                and entry.key in changed_keys
+            ):
+                values[entry.key] = entry.updated_value
+
+        if changed_keys:
+            self._own_values()
+        for key in changed_keys:
+            value = values.get(key)
+            if value is None:
+                if key in self._dict:
+                    StenoDictionary.__delitem__(self, key)
+            elif self._dict.get(key) != value:
+                StenoDictionary.__setitem__(self, key, value)
+
+        self.rich_lines = self._new_rich_lines(rich_lines)
+        self.shared_rich_lines = False
+        self._release_shared_parse()
+        self.plover_adds_section_end_index = parser.plover_adds_section_end_index
+        self.code_blocks = parser.code_blocks
+        self._index_rich_lines()
+        self.file_stat = stat
+        self.modified_code_blocks = set()
+        self.edited_keys = set()
+        self._replay_journal(filename)
+        if self.path is not None:
+            self.timestamp = resource_timestamp(filename)
+
+    def _index_rich_lines(self):
+        key_lines = {}
+        # repeated and deleted definitions change on the first save
+        dirty_keys = set()
+        lines_match_file = True
+        get_value = self._dict.get
+        for i, entry in enumerate(self.rich_lines):
+            if entry.kind == "entry" and not entry.is_new:
+                if entry._text is None:
+                    lines_match_file = False
+                key = entry.key
+                positions = key_lines.get(key)
+                if positions is None:
+                    key_lines[key] = [i]
+                else:
+                    positions.append(i)
+                value = get_value(key)
+                if entry.updated_value != value or entry.is_deleted != (
+                    value is None
+                ):
+                    dirty_keys.add(key)
+        self.key_lines = key_lines
+        self.dirty_keys = dirty_keys
+        self.added_lines = None
+        self.lines_match_file = lines_match_file
+        self.line_offsets = None
+        self._find_new_keys()
+
+    def _find_new_keys(self):
+        key_lines = self.key_lines
+        self.new_keys = {key: None for key in self._dict if key not in key_lines}
+
+    def _new_rich_lines(self, rich_lines):
+        if self.COLUMNAR_RICH_LINES:
+            return ColumnarRichLines(rich_lines)
+        return list(rich_lines)
+
+    # What's kept for a file in each cache has system.NAME in its key or
+    # header, since steno keys are normalized for the current system.
+
+    @classmethod
+    def _cache_path(cls, filename, suffix):
+        """The path in ``PARSE_CACHE_DIR`` of what's kept for ``filename``,
+        named by a hash of its absolute path."""
+        name = hashlib.blake2b(
+            os.path.abspath(filename).encode(), digest_size=16
+        ).hexdigest()
+        return os.path.join(cls.PARSE_CACHE_DIR, name + suffix)
+
+    @classmethod
+    def open_compiled(cls, filename):
+        """Open the ``CompiledDictionary`` of the markdown dictionary
+        ``filename`` in ``PARSE_CACHE_DIR``, compiling it first if there
+        isn't one for the file as it is now."""
+        compiled_path = cls._cache_path(filename, ".compiled")
+        source = [
+            os.path.abspath(filename),
+            system.NAME,
+            list(file_signature(filename)),
+        ]
+        try:
+            compiled = CompiledDictionary(compiled_path)
+        except (OSError, ValueError, struct.error):
+            # missing, from another version or corrupt
+            pass
+        else:
+            if compiled.source == source:
+                return compiled
+            compiled.close()
+
+        os.makedirs(cls.PARSE_CACHE_DIR, exist_ok=True)
+        compile_dictionary(filename, compiled_path, source)
+        return CompiledDictionary(compiled_path)
+
+    def _load_cache_key(self, filename):
+        return (
+            os.path.realpath(filename),
+            system.NAME,
+            self.PLOVER_ADDS_TITLE,
+            self.COLUMNAR_RICH_LINES,
+        )
+
+    def _read_load_cache(self, filename, stat):
+        """Share the parse of the file from ``load_cache``, and return
+        whether there was one."""
+        if not self.LOAD_CACHE:
+            return False
+        parse = load_cache.get(self._load_cache_key(filename), stat[1:])
+        if parse is None:
+            return False
+        self._dict = parse.mapping
+        self.reverse = parse.reverse
+        self.casereverse = parse.casereverse
+        self._longest_key = parse.longest_key
+        self.rich_lines = parse.rich_lines
+        self.plover_adds_section_end_index = parse.plover_adds_section_end_index
+        self.code_blocks = parse.code_blocks
+        self.key_lines = parse.key_lines
+        self.dirty_keys = set(parse.dirty_keys)
+        self.new_keys = dict(parse.new_keys)
+        self.lines_match_file = parse.lines_match_file
+        self.added_lines = None
+        self.line_offsets = None
+        self.shared_parse = parse
+        self.shared_values = True
+        self.shared_rich_lines = True
+        return True
+
+    def _write_load_cache(self, filename, stat):
+        if not self.LOAD_CACHE:
+            return
+        signature = stat[1:]
+        if time.time() - stat[2] / 1e9 < self.LOAD_CACHE_MIN_AGE:
+            # only to reuse its code blocks, which are checked
+            signature = None
+        self.shared_parse = SharedParse(self)
+        load_cache.put(
+            self._load_cache_key(filename), signature, stat[1], self.shared_parse
+        )
+        self.shared_values = True
+        self.shared_rich_lines = True
+
+    def _parse_cache_header(self, filename, signature):
+        return (
+            self.PARSE_CACHE_VERSION,
+            os.path.abspath(filename),
+            system.NAME,
+            self.PLOVER_ADDS_TITLE,
+            signature,
+        )
+
+    def _read_parse_cache(self, filename, signature):
+        """Load ``rich_lines`` from the cache, adding their entries to the
+        dictionary, and return whether there was a valid cache."""
+        try:
+            with open(self._cache_path(filename, ".pickle"), "rb") as f:
+                header, adds_section_end_index, code_blocks = pickle.load(f)
+                if header != self._parse_cache_header(filename, signature):
+                    return False
+                rich_lines = self._new_rich_lines(
+                    self._insert_entries(
+                        map(rich_line_from_row, read_pickled_chunks(f))
+                    )
+                )
+        except Exception:
+            # missing, stale or corrupt: it gets rebuilt
+            StenoDictionary.clear(self)
+            return False
+
+        self.rich_lines = rich_lines
+        self.plover_adds_section_end_index = adds_section_end_index
+        self.code_blocks = code_blocks
+        return True
+
+    def _write_parse_cache(self, filename, signature):
+        cache_path = self._cache_path(filename, ".pickle")
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.PARSE_CACHE_DIR, exist_ok=True)
+            with open(temp_path, "wb") as f:
+                pickle.dump(
+                    (
+                        self._parse_cache_header(filename, signature),
+                        self.plover_adds_section_end_index,
+                        self.code_blocks,
+                    ),
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+                write_pickled_chunks(f, map(rich_line_to_row, self.rich_lines))
+            os.replace(temp_path, cache_path)
+        except OSError:
+            # the cache is only an optimization
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+    def save(self):
+        # _save writes the file safely itself, or patches it in place, so it
+        # doesn't need a temporary file from resource_update
+        assert not self.readonly
+        filename = resource_filename(self.path)
+        if self.JOURNAL:
+            # the changes are already in the journal, unless the file is new
+            if (
+                os.path.exists(filename)
+                and self.journal_started_at is not None
+                and (
+                    self.journal_size < self.JOURNAL_MAX_SIZE
+                    and time.monotonic() - self.journal_started_at
+                    < self.JOURNAL_MAX_AGE
+                )
+            ):
+                return
+        elif self.BACKGROUND_SAVE:
+            self._save_in_background(filename)
+            return
+        self.compact()
+
+    def _save_in_background(self, filename):
+        if self.rich_lines is None:
+            self._load_rich_lines(filename)
+        changes = self._take_changes()
+        with self.save_condition:
+            if self.pending_save is not None:
+                changes = merge_changes(self.pending_save[1], changes)
+            self.pending_save = (filename, changes)
+            self.save_requested_at = time.monotonic()
+            if self.save_thread is None:
+                self.save_thread = threading.Thread(
+                    target=self._background_saver,
+                    name=f"MarkdownDictionary save {filename}",
+                )
+                self.save_thread.start()
+            self.save_condition.notify_all()
+
+    def _background_saver(self):
+        while True:
+            with self.save_condition:
+                while True:
+                    if self.pending_save is None:
+                        self.save_thread = None
+                        self.save_now = False
+                        self.save_condition.notify_all()
+                        return
+                    delay = (
+                        self.save_requested_at
+                        + self.BACKGROUND_SAVE_DELAY
+                        - time.monotonic()
+                    )
+                    if self.save_now or delay <= 0:
+                        break
+                    self.save_condition.wait(delay)
+
+            with self.write_lock:
+                # _save might have written it in the meantime
+                with self.save_condition:
+                    pending_save = self.pending_save
+                    self.pending_save = None
+                if pending_save is None:
+                    continue
+                filename, changes = pending_save
+                try:
+                    self._write(filename, changes)
+                    self.timestamp = resource_timestamp(filename)
+                    self._remove_journal(filename)
+                except Exception:
+                    log.error("failed to save %s", filename, exc_info=True)
+
+    def _write_journal(self, *records):
+        """Add changes to the journal: ``[key, translation]`` to set a key,
+        ``[key]`` to delete it, or ``[]`` to delete every key."""
+        if self.path is None:
+            # there's no file to write it to yet
+            return
+        if self.journal is None:
+            self.journal = open(
+                f"{resource_filename(self.path)}.journal", "ab", buffering=0
+            )
+        if self.journal_started_at is None:
+            self.journal_started_at = time.monotonic()
+        # one unbuffered write, so the changes are in the file straight away
+        self.journal_size += self.journal.write(
+            "".join(json.dumps(record) + "\n" for record in records).encode()
+        )
+
+    def _replay_journal(self, filename):
+        """Apply the changes in the journal for ``filename``, if there is
+        one, on top of the loaded file."""
+        journal_path = f"{filename}.journal"
+        try:
+            with open(journal_path, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+
+        self.replaying_journal = True
+        try:
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # cut short while being written
+                    log.warning("ignoring incomplete change in %s", journal_path)
+                    break
+                if not record:
+                    self.clear()
+                    continue
+                # the key as it was set
+                key = tuple(record[0].split("/"))
+                if len(record) == 2:
+                    self[key] = record[1]
+                elif key in self._dict:
+                    del self[key]
+        finally:
+            self.replaying_journal = False
+        if lines:
+            self.journal_size = sum(map(len, lines))
+            self.journal_started_at = time.monotonic()
+
+    def compact(self):
+        """Save the file now, and remove the journal, whose changes are now
+        in the file."""
+        filename = resource_filename(self.path)
+        self._save(filename)
+        self.timestamp = resource_timestamp(filename)
+        self._remove_journal(filename)
+
+    def _remove_journal(self, filename):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        self.journal_size = 0
+        self.journal_started_at = None
+        # if this doesn't happen, applying the journal again changes nothing
+        try:
+            os.unlink(f"{filename}.journal")
+        except FileNotFoundError:
+            pass
+
+    def flush(self):
+        """Write the changes waiting to be saved in the background now, and
+        wait until they're written."""
+        with self.save_condition:
+            if self.save_thread is not None:
+                self.save_now = True
+                self.save_condition.notify_all()
+        self.wait_for_saves()
+
+    def wait_for_saves(self, timeout=None):
+        """Wait until there are no saves waiting or being written in the
+        background. Returns ``False`` on timing out."""
+        with self.save_condition:
+            return self.save_condition.wait_for(
+                lambda: self.save_thread is None, timeout
+            )
+
+    def _can_patch(self, filename):
+        if not (self.PATCH_SAVE and self.lines_match_file):
+            return False
+        try:
+            stat = file_stat(filename)
+        except OSError:
+            return False
+        if stat != self.file_stat:
+            return False
+        if self.line_offsets is None:
+            self.line_offsets = line_offsets(line.text for line in self.rich_lines)
+        # e.g. if the file has \r\n newlines
+        return self.line_offsets[-1] == stat[1]
+
+    def _take_changes(self):
+        """The values of the keys changed since the last save, and the keys
+        without entries with their values, in order."""
+        get_value = self._dict.get
+        values = {key: get_value(key) for key in self.dirty_keys}
+        self.dirty_keys = set()
+        new_entries = [(key, get_value(key)) for key in self.new_keys]
+        return values, new_entries
 
     def _save(self, filename):
-        self.rich_lines = [line for line in self.rich_lines if not line.is_new]
+        with self.write_lock:
+            if self.rich_lines is None:
+                self._load_rich_lines(filename)
+            changes = self._take_changes()
+            # a background save waiting to be written is older
+            with self.save_condition:
+                if self.pending_save is not None:
+                    changes = merge_changes(self.pending_save[1], changes)
+                    self.pending_save = None
+            self._write(filename, changes)
 
-        for entry in self.rich_lines:
-            if entry.kind == "entry":
-                current_value = self._dict.get(entry.key)
-                entry.updated_value = current_value
-                if entry.is_new:
-                    entry.value = current_value
-                entry.is_deleted = current_value is None
+    def _write(self, filename, changes):
+        values, new_entries = changes
+        patch = self._can_patch(filename)
+        self._own_rich_lines()
+        # until the file has been written
+        self.lines_match_file = False
+        old_line_count = len(self.rich_lines)
+        removed_at = None
+        if self.added_lines is not None:
+            start, end = self.added_lines
+            self.rich_lines[start:end] = []
+            self.added_lines = None
+            removed_at = start
 
-        new_adds_lines = []
-        known_keys = [entry.key for entry in self.rich_lines if entry.kind == "entry"]
-        new_keys = [key for key in self._dict.keys() if key not in known_keys]
+        # only the entries of keys changed since the last save can be out of
+        # date, and the rest keep their text
+        modified_lines = []
+        for key, current_value in values.items():
+            for i in self.key_lines.get(key, ()):
+                entry = self.rich_lines[i]
+                if entry.updated_value != current_value or entry.is_deleted != (
+                    current_value is None
+                ):
+                    modified_lines.append(i)
+                    if type(entry) is Entry:
+                        # it can be in other dictionaries' rich_lines
+                        entry = self.rich_lines[i] = copy(entry)
+                    entry.updated_value = current_value
+                    entry.is_deleted = current_value is None
+                    entry.text = None
+
+        if modified_lines and self.code_blocks:
+            # these entries no longer match the loaded text
+            block_starts = [start for start, _, _ in self.code_blocks]
+            self.modified_code_blocks.update(
+                bisect_right(block_starts, i) - 1 for i in modified_lines
+            )
 
-        for new_key in new_keys:
-            new_value = self._dict.get(new_key)
+        new_adds_lines = []
+        for new_key, new_value in new_entries:
             if new_value:
                 key = "/".join(new_key)
                 key_quote = (
@@ -264,25 +2595,7 @@ class MarkdownDictionary(StenoDictionary):
                     else ""
                 )
 
-                value_quote = ""
-                if (
-                    '"' not in new_value
-                    and (
-                        new_value.startswith(" ")
-                        or new_value.endswith(" ")
-                        or "'" in new_value
-                        or "#" in new_value
-                    )
-                    or ('"' in new_value and "'" in new_value)
-                ):
-                    value_quote = '"'
-                elif "'" not in new_value and (
-                    new_value.startswith(" ")
-                    or new_value.endswith(" ")
-                    or '"' in new_value
-                    or "#" in new_value
-                ):
-                    value_quote = "'"
+                value_quote = quote_for_value(new_value)
 
                 new_adds_lines.append(
                     Entry(
@@ -300,18 +2613,149 @@ class MarkdownDictionary(StenoDictionary):
                     )
                 )
 
+        added_lines = None
         if len(new_adds_lines) > 0:
             if self.plover_adds_section_end_index:
                 self.rich_lines[
                     self.plover_adds_section_end_index : self.plover_adds_section_end_index
                 ] = new_adds_lines
+                self.added_lines = (
+                    self.plover_adds_section_end_index,
+                    self.plover_adds_section_end_index + len(new_adds_lines),
+                )
             else:
+                start = len(self.rich_lines)
                 self.rich_lines.append(Prose("\n", True))
                 self.rich_lines.append(Prose(self.PLOVER_ADDS_TITLE, True))
                 self.rich_lines.append(Prose("\n", True))
                 self.rich_lines.append(Prose("```yaml\n", True))
                 self.rich_lines.extend(new_adds_lines)
                 self.rich_lines.append(Prose("```\n", True))
+                self.added_lines = (start, len(self.rich_lines))
+
+            added_lines = self.added_lines
+
+        if patch:
+            changed_lines = set(modified_lines)
+            if added_lines is not None:
+                # the lines after them have moved down
+                start, end = added_lines
+                changed_lines = {
+                    i if i < start else i + end - start for i in changed_lines
+                }
+                changed_lines.update(range(start, end))
+            if removed_at is not None:
+                changed_lines.add(removed_at)
+            self._patch(
+                filename, changed_lines, len(self.rich_lines) != old_line_count
+            )
+            self.lines_match_file = True
+        else:
+            write_lines_atomically(
+                filename, (rich_line.text for rich_line in self.rich_lines)
+            )
+            self.lines_match_file = True
+            self.line_offsets = None
+        self.file_stat = file_stat(filename)
+
+    def _patch(self, filename, changed_lines, line_count_changed):
+        """Write the lines at ``changed_lines`` over the file as it was last
+        loaded or saved. If lines were added or removed, or changed length,
+        the file is rewritten from the first one on."""
+        if not changed_lines:
+            return
+        encoding = locale.getpreferredencoding(False)
+        offsets = self.line_offsets
+        with open(filename, "r+b") as f:
+            if not line_count_changed:
+                changed_texts = {
+                    i: self.rich_lines[i].text.encode(encoding) for i in changed_lines
+                }
+                if all(
+                    len(text) == offsets[i + 1] - offsets[i]
+                    for i, text in changed_texts.items()
+                ):
+                    for i in sorted(changed_texts):
+                        f.seek(offsets[i])
+                        f.write(changed_texts[i])
+                    return
+
+            first = min(changed_lines)
+            texts = [line.text for line in self.rich_lines[first:]]
+            f.seek(offsets[first])
+            f.write("".join(texts).encode(encoding))
+            f.truncate()
+        self.line_offsets = offsets[:first] + line_offsets(
+            texts, offsets[first], encoding
+        )
+
+
+# The settings of MarkdownDictionary that can be changed without changing the
+# code, by listing them in this environment variable before starting Plover,
+# separated by spaces or commas: "LEAN_READONLY" turns one on, and
+# "BACKGROUND_SAVE_DELAY=2" gives it a value.
+SETTINGS_VARIABLE = "PLOVER_MARKDOWN_DICTIONARY"
+SETTINGS = (
+    "PARALLEL_LOAD",
+    "PARALLEL_LOAD_MIN_SIZE",
+    "PARALLEL_LOAD_WORKERS",
+    "PARSE_CACHE",
+    "PARSE_CACHE_DIR",
+    "LOAD_CACHE",
+    "LOAD_CACHE_MIN_AGE",
+    "LEAN_READONLY",
+    "LAZY_VALUES",
+    "COMPILED",
+    "COLUMNAR_RICH_LINES",
+    "PATCH_SAVE",
+    "BACKGROUND_SAVE",
+    "BACKGROUND_SAVE_DELAY",
+    "JOURNAL",
+    "JOURNAL_MAX_SIZE",
+    "JOURNAL_MAX_AGE",
+)
+
+
+BOOLEAN_VALUES = {
+    "true": True,
+    "on": True,
+    "1": True,
+    "false": False,
+    "off": False,
+    "0": False,
+}
+
+
+def setting_value(name, default, value):
+    """Convert ``value`` to the type of the setting's ``default``, or raise
+    ValueError. The ``*_WORKERS`` settings take None or a whole number."""
+    if name.endswith("_WORKERS"):
+        return None if value == "None" else int(value)
+    if isinstance(default, bool):
+        return BOOLEAN_VALUES[value.lower()]
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    return value
+
+
+def apply_settings(cls, text):
+    """Set the ``SETTINGS`` in ``text`` (as in ``SETTINGS_VARIABLE``) on
+    ``cls``, converted to the type of their defaults. Anything else is logged
+    and ignored."""
+    for setting in text.replace(",", " ").split():
+        name, has_value, value = setting.partition("=")
+        if name not in SETTINGS:
+            log.warning("ignoring unknown markdown dictionary setting %s", name)
+            continue
+        default = getattr(cls, name)
+        try:
+            if not has_value and not isinstance(default, bool):
+                raise ValueError(f"{name} needs a value")
+            value = setting_value(name, default, value) if has_value else True
+        except (KeyError, ValueError):
+            log.warning("ignoring invalid markdown dictionary setting %s", setting)
+            continue
+        setattr(cls, name, value)
+
 
-        with open(filename, "w") as f:
-            f.write("".join([str(rich_line) for rich_line in self.rich_lines]))
+apply_settings(MarkdownDictionary, os.environ.get(SETTINGS_VARIABLE, ""))
@@ -0,0 +1,383 @@
+"""Time loading and saving synthetic markdown dictionaries.
+
+Dictionaries of each size and mix of lines are generated from a seed, so
+every run times the same files. Each scenario runs --repeat times and the
+median is reported. The results are printed as JSON, or written to
+--output, and --compare prints how much faster or slower each one is than
+an earlier run's JSON.
+
+Only Plover is needed. The parse cache is off unless turned on with --set
+(e.g. --set PARSE_CACHE=True), and goes in a temporary directory.
+
+    python scripts/benchmark.py --sizes 1000,10000 --output before.json
+    python scripts/benchmark.py --sizes 1000,10000 --compare before.json
+"""
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import plover
+from plover import system
+from plover.registry import registry
+from plover.steno import normalize_steno
+
+import plover_markdown_dictionary
+from plover_markdown_dictionary import MarkdownDictionary
+
+registry.update()
+system.setup("English Stenotype")
+
+
+# The fraction of lines of each kind, and how many entries go in each code
+# block (None for one block with all of them).
+MIXES = {
+    "plain": {
+        "quoted": 0,
+        "escaped": 0,
+        "commented": 0,
+        "deleted": 0,
+        "updated": 0,
+        "block_size": None,
+    },
+    "rich": {
+        "quoted": 0.1,
+        "escaped": 0.05,
+        "commented": 0.2,
+        "deleted": 0.02,
+        "updated": 0.05,
+        "block_size": 20,
+    },
+}
+SIZES = (1000, 10000, 100000, 1000000)
+
+LEFT = ("", "S", "T", "K", "P", "W", "H", "R", "TK", "PW", "HR", "KW", "TP")
+VOWELS = ("", "A", "O", "E", "U", "AO", "AOE", "AEU", "EU", "OE", "OU", "A*", "*E")
+RIGHT = ("", "F", "R", "P", "B", "L", "G", "T", "S", "D", "Z", "PB", "PL", "BG")
+SYLLABLES = (
+    "ba", "ca", "de", "fo", "gu", "hi", "ja", "ke", "lo", "mu", "ni",
+    "pa", "qui", "ro", "su", "te", "vi", "wo", "xe", "yu", "ze", "th",
+)
+ESCAPED_VALUES = ("{} \\# {}", "{{^\\\\n\\\\n^}}{}{}", '"{} \\" {}"')
+
+
+def random_stroke(rng):
+    while True:
+        left, vowels, right = (
+            rng.choice(LEFT), rng.choice(VOWELS), rng.choice(RIGHT)
+        )
+        if left or vowels or right:
+            break
+    if not vowels and right:
+        vowels = "-"
+    return left + vowels + right
+
+
+def random_key(rng):
+    strokes = [random_stroke(rng) for _ in range(rng.choice((1, 1, 2, 2, 3)))]
+    return "/".join(normalize_steno("/".join(strokes)))
+
+
+def random_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+
+
+def random_translation(rng):
+    return " ".join(random_word(rng) for _ in range(rng.choice((1, 1, 1, 2, 3))))
+
+
+def generate_markdown(entries, mix, seed=0):
+    """Return the text of a markdown dictionary with ``entries`` entry lines
+    made with ``mix`` from ``MIXES``. The same arguments always give the same
+    text."""
+    rng = random.Random(seed)
+    block_size = mix["block_size"] or entries
+    kinds = ("quoted", "escaped", "commented", "deleted", "updated")
+    thresholds = []
+    total = 0
+    for kind in kinds:
+        total += mix[kind]
+        thresholds.append((total, kind))
+
+    lines = ["# Synthetic dictionary\n", "\n"]
+    seen = set()
+    for i in range(entries):
+        if i % block_size == 0:
+            if i:
+                lines.append("```\n")
+                lines.append("\n")
+            lines.append(f"## {random_word(rng).title()} {i // block_size}\n")
+            lines.append("\n")
+            lines.append(f"Some prose about {random_translation(rng)}.\n")
+            lines.append("\n")
+            lines.append("```yaml\n")
+
+        key = random_key(rng)
+        while key in seen:
+            key = random_key(rng)
+        seen.add(key)
+
+        value = random_translation(rng)
+        roll = rng.random()
+        kind = next((kind for limit, kind in thresholds if roll < limit), "plain")
+        if kind == "quoted":
+            lines.append(f"{key}: \"{value} '{random_word(rng)}'\"\n")
+        elif kind == "escaped":
+            escaped = rng.choice(ESCAPED_VALUES)
+            lines.append(f"{key}: {escaped.format(value, random_word(rng))}\n")
+        elif kind == "commented":
+            lines.append(f"{key}: {value}  # {random_translation(rng)}\n")
+        elif kind == "deleted":
+            lines.append(f"(DELETED) {key}: {value}\n")
+        elif kind == "updated":
+            lines.append(f"(UPDATED) {key}: {value}\n")
+        else:
+            lines.append(f"{key}: {value}\n")
+    if entries:
+        lines.append("```\n")
+    return "".join(lines)
+
+
+def new_keys(dictionary, count, seed=1):
+    """``count`` keys that aren't in ``dictionary``, always the same ones."""
+    rng = random.Random(seed)
+    keys = []
+    while len(keys) < count:
+        key = tuple(random_key(rng).split("/")) + ("STKPWHR",)
+        if key not in dictionary and key not in keys:
+            keys.append(key)
+    return keys
+
+
+# The scenarios also run on commits from before flush(), apply_changes() and
+# load_cache, so that they can be compared with.
+
+
+def flush(dictionary):
+    if hasattr(dictionary, "flush"):
+        dictionary.flush()
+
+
+# Each scenario gets the dictionary class, the generated file and a path to
+# work on, does what doesn't need timing, and returns what does.
+
+
+def load(dictionary_class, source, path):
+    shutil.copyfile(source, path)
+    return lambda: dictionary_class.load(path)
+
+
+def save(dictionary_class, source, path):
+    """Save every entry of the file to a new one."""
+    entries = dict(dictionary_class.load(source).items())
+
+    def run():
+        dictionary = dictionary_class.create(path)
+        dictionary.update(entries)
+        dictionary.save()
+        flush(dictionary)
+
+    return run
+
+
+def round_trip(dictionary_class, source, path):
+    shutil.copyfile(source, path)
+
+    def run():
+        dictionary = dictionary_class.load(path)
+        dictionary.save()
+        flush(dictionary)
+
+    return run
+
+
+def single_edit_save(dictionary_class, source, path):
+    shutil.copyfile(source, path)
+    dictionary = dictionary_class.load(path)
+    keys = list(dictionary)
+    key = keys[len(keys) // 2]
+
+    def run():
+        dictionary[key] = "edited"
+        dictionary.save()
+        flush(dictionary)
+
+    return run
+
+
+def bulk_add(dictionary_class, source, path, count=1000):
+    shutil.copyfile(source, path)
+    dictionary = dictionary_class.load(path)
+    adds = {key: f"added {i}" for i, key in enumerate(new_keys(dictionary, count))}
+
+    def run():
+        if hasattr(dictionary, "apply_changes"):
+            dictionary.apply_changes(adds=adds)
+        else:
+            dictionary.update(adds)
+            dictionary.save()
+        flush(dictionary)
+
+    return run
+
+
+SCENARIOS = {
+    "load": load,
+    "save": save,
+    "round_trip": round_trip,
+    "single_edit_save": single_edit_save,
+    "bulk_add": bulk_add,
+}
+
+
+def time_scenario(scenario, dictionary_class, source, path, repeat):
+    times = []
+    for _ in range(repeat):
+        if hasattr(plover_markdown_dictionary, "load_cache"):
+            plover_markdown_dictionary.load_cache.clear()
+        run = scenario(dictionary_class, source, path)
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        del run
+    return times
+
+
+def parse_settings(settings):
+    """Turn ``NAME=VALUE`` strings into class attributes."""
+    attributes = {}
+    for setting in settings:
+        name, _, value = setting.partition("=")
+        if not hasattr(MarkdownDictionary, name):
+            raise SystemExit(f"MarkdownDictionary has no setting {name}")
+        attributes[name] = ast.literal_eval(value)
+    return attributes
+
+
+def compare(results, baseline):
+    old_medians = {
+        (result["scenario"], result["mix"], result["entries"]): result["median"]
+        for result in baseline["results"]
+    }
+    for result in results:
+        old = old_medians.get((result["scenario"], result["mix"], result["entries"]))
+        if old is None:
+            continue
+        print(
+            f"{result['scenario']:>16} {result['mix']:>6} {result['entries']:>8}"
+            f" {old:9.4f}s -> {result['median']:9.4f}s"
+            f" ({old / result['median']:.2f}x)",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, SIZES)),
+        help="comma separated numbers of entries",
+    )
+    parser.add_argument(
+        "--mixes", default=",".join(MIXES), help="comma separated names of mixes"
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="comma separated names of scenarios",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="set a MarkdownDictionary setting, e.g. PATCH_SAVE=True",
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    mixes = args.mixes.split(",")
+    scenarios = args.scenarios.split(",")
+    for name in mixes:
+        if name not in MIXES:
+            raise SystemExit(f"Unknown mix {name}")
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name}")
+
+    settings = {"PARSE_CACHE": False, "LOAD_CACHE": False}
+    settings.update(parse_settings(args.set))
+    work_dir = tempfile.mkdtemp(prefix="markdown_benchmark")
+    dictionary_class = type(
+        "BenchmarkDictionary",
+        (MarkdownDictionary,),
+        {**settings, "PARSE_CACHE_DIR": os.path.join(work_dir, "parse_cache")},
+    )
+
+    results = []
+    try:
+        for mix in mixes:
+            for size in sizes:
+                source = os.path.join(work_dir, f"{mix}_{size}.md")
+                with open(source, "w") as f:
+                    f.write(generate_markdown(size, MIXES[mix], args.seed))
+                for name in scenarios:
+                    path = os.path.join(work_dir, "dictionary.md")
+                    times = time_scenario(
+                        SCENARIOS[name], dictionary_class, source, path, args.repeat
+                    )
+                    median = statistics.median(times)
+                    print(
+                        f"{name:>16} {mix:>6} {size:>8} {median:9.4f}s",
+                        file=sys.stderr,
+                    )
+                    results.append(
+                        {
+                            "scenario": name,
+                            "mix": mix,
+                            "entries": size,
+                            "median": median,
+                            "min": min(times),
+                            "max": max(times),
+                            "times": times,
+                        }
+                    )
+                os.unlink(source)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "python": platform.python_version(),
+        "plover": plover.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "settings": settings,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
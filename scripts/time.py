@@ -7,11 +7,15 @@ from plover.oslayer.config import ASSETS_DIR
 from plover import system
 from plover.registry import registry
 
-from plover_markdown_dictionary import MarkdownDictionary
+from plover_markdown_dictionary import MarkdownDictionary, entry_from_text
 
 registry.update()
 system.setup("English Stenotype")
 
+# Time parsing every time, without reusing parses from earlier loads or runs.
+MarkdownDictionary.PARSE_CACHE = False
+MarkdownDictionary.LOAD_CACHE = False
+
 MAIN_DICT = Path(ASSETS_DIR) / "main.json"
 OUTPUT_JSON = Path("./output.json")
 OUTPUT_MD = Path("./output.md")
@@ -30,6 +34,20 @@ def load_markdown():
     return md_dict
 
 
+def parse_markdown_entries():
+    with open(OUTPUT_MD, "r") as f:
+        lines = [line for line in f if ": " in line]
+
+    for line in lines:
+        entry_from_text(line)
+
+
+def reverse_lookup_markdown(md_dict):
+    for translation in list(md_dict._dict.values()):
+        md_dict.reverse_lookup(translation)
+        md_dict.casereverse_lookup(translation.lower())
+
+
 def load_json_save_json():
     json_dict = load_json()
 
@@ -70,9 +88,16 @@ if __name__ == "__main__":
     with timer("Load JSON + Save Markdown"):
         load_json_save_md()
 
+    with timer("Parse Markdown entries"):
+        parse_markdown_entries()
+
     with timer("Load Markdown"):
         load_markdown()
 
+    md_dict = load_markdown()
+    with timer("Reverse lookup Markdown translations"):
+        reverse_lookup_markdown(md_dict)
+
     with timer("Load Markdown + Save Markdown"):
         load_markdown_save_markdown()
 
@@ -0,0 +1,82 @@
+import pytest
+
+from plover_markdown_dictionary import MarkdownDictionary
+
+
+TEXT = """# Dictionary
+
+```yaml
+TEFT: test
+S-G: something
+HEU/HRO: hello
+```
+"""
+
+
+@pytest.fixture
+def dictionary(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    return MarkdownDictionary.load(str(filepath))
+
+
+def test_apply_changes(dictionary):
+    summary = dictionary.apply_changes(
+        adds={("A",): "a", ("B", "-B"): "b"},
+        updates={("TEFT",): "TEST", ("S-G",): "something"},
+        deletes=[("HEU", "HRO")],
+    )
+
+    assert summary == {
+        "added": [("A",), ("B", "-B")],
+        "updated": [("TEFT",)],
+        "deleted": [("HEU", "HRO")],
+        "unchanged": [("S-G",)],
+    }
+    assert dict(dictionary.items()) == {
+        ("S-G",): "something",
+        ("TEFT",): "TEST",
+        ("A",): "a",
+        ("B", "-B"): "b",
+    }
+    assert dictionary.reverse_lookup("TEST") == {("TEFT",)}
+    assert dictionary.reverse_lookup("hello") == set()
+    assert dictionary.casereverse_lookup("test") == {"TEST"}
+    assert dictionary.longest_key == 2
+    with open(dictionary.path) as f:
+        assert f.read() == (
+            TEXT.replace("TEFT: test", "(UPDATED) TEFT: TEST").replace(
+                "HEU/HRO: hello", "(DELETED) HEU/HRO: hello"
+            )
+            + "\n## Added by Plover\n\n```yaml\nA: a\nB/-B: b\n```\n"
+        )
+
+
+def test_longest_key(dictionary):
+    dictionary.apply_changes(deletes=[("HEU", "HRO")])
+    assert dictionary.longest_key == 1
+    dictionary.apply_changes(adds={("A", "B", "C"): "abc"})
+    assert dictionary.longest_key == 3
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"adds": {("B",): "b", ("TEFT",): "test"}},
+        {"updates": {("A",): "a"}},
+        {"deletes": [("A",)]},
+        {"deletes": [("TEFT",), ("TEFT",)]},
+        {"updates": {("B",): "b"}},
+        {"adds": {("B",): "b", "A": "a"}},
+        {"adds": {("B",): "b", (): "a"}},
+        {"adds": {("B",): "b", ("A",): None}},
+    ],
+)
+def test_invalid_changes(dictionary, changes):
+    with pytest.raises(ValueError):
+        dictionary.apply_changes(**{"adds": {("B",): "b"}, **changes})
+
+    assert len(dictionary) == 3
+    assert ("B",) not in dictionary
+    with open(dictionary.path) as f:
+        assert f.read() == TEXT
@@ -0,0 +1,92 @@
+import pytest
+
+from plover_markdown_dictionary import MarkdownDictionary
+
+
+TEXT = """# Dictionary
+
+```yaml
+TEFT: test
+```
+"""
+UPDATED_TEXT = TEXT.replace("TEFT: test", "(UPDATED) TEFT: TEST")
+
+
+@pytest.fixture
+def dictionary(tmp_path, monkeypatch):
+    monkeypatch.setattr(MarkdownDictionary, "BACKGROUND_SAVE", True)
+    monkeypatch.setattr(MarkdownDictionary, "BACKGROUND_SAVE_DELAY", 60)
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = MarkdownDictionary.load(str(filepath))
+    yield dictionary
+    dictionary.flush()
+
+
+def count_writes(dictionary, monkeypatch):
+    writes = []
+    write = dictionary._write
+
+    def counted_write(filename, changes):
+        writes.append(changes)
+        write(filename, changes)
+
+    monkeypatch.setattr(dictionary, "_write", counted_write)
+    return writes
+
+
+def test_saves_are_combined(dictionary, monkeypatch):
+    writes = count_writes(dictionary, monkeypatch)
+
+    dictionary[("A",)] = "a"
+    dictionary.save()
+    dictionary[("TEFT",)] = "TEST"
+    dictionary.save()
+    dictionary[("B",)] = "b"
+    del dictionary[("A",)]
+    dictionary.save()
+
+    assert dictionary.save_thread is not None
+    assert dictionary.wait_for_saves(timeout=0.01) is False
+    with open(dictionary.path) as f:
+        assert f.read() == TEXT
+
+    dictionary.flush()
+    assert len(writes) == 1
+    assert dictionary.save_thread is None
+    with open(dictionary.path) as f:
+        assert f.read() == (
+            UPDATED_TEXT + "\n## Added by Plover\n\n```yaml\nB: b\n```\n"
+        )
+
+
+def test_saves_after_the_delay(dictionary, monkeypatch):
+    monkeypatch.setattr(MarkdownDictionary, "BACKGROUND_SAVE_DELAY", 0.01)
+
+    dictionary[("TEFT",)] = "TEST"
+    dictionary.save()
+
+    assert dictionary.wait_for_saves(timeout=10)
+    with open(dictionary.path) as f:
+        assert f.read() == UPDATED_TEXT
+
+
+def test_save_now_includes_waiting_save(dictionary, monkeypatch):
+    writes = count_writes(dictionary, monkeypatch)
+
+    dictionary[("TEFT",)] = "TEST"
+    dictionary.save()
+    dictionary[("A",)] = "a"
+    dictionary._save(dictionary.path)
+    dictionary.flush()
+
+    assert len(writes) == 1
+    with open(dictionary.path) as f:
+        assert f.read() == (
+            UPDATED_TEXT + "\n## Added by Plover\n\n```yaml\nA: a\n```\n"
+        )
+
+
+def test_flush_without_saves(dictionary):
+    dictionary.flush()
+    assert dictionary.wait_for_saves(timeout=0)
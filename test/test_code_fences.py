@@ -0,0 +1,37 @@
+import pytest
+
+from plover_markdown_dictionary import closes_fence, parse_fence
+
+
+@pytest.mark.parametrize(
+    "line, fence",
+    [
+        ("```\n", ("```", "")),
+        ("```yaml\n", ("```", "yaml")),
+        ("````yaml  \n", ("````", "yaml")),
+        ("```python\n", ("```", "python")),
+        ("```some_word\n", ("```", "some_word")),
+        ("``\n", None),
+        ("```two words\n", None),
+        ("```yaml", None),
+        (" ```\n", None),
+    ],
+)
+def test_parse_fence(line, fence):
+    assert parse_fence(line) == fence
+
+
+@pytest.mark.parametrize(
+    "line, ticks, closes",
+    [
+        ("```\n", "```", True),
+        ("```  \n", "```", True),
+        ("````\n", "````", True),
+        ("````\n", "```", False),
+        ("```\n", "````", False),
+        ("```yaml\n", "```", False),
+        ("```", "```", False),
+    ],
+)
+def test_closes_fence(line, ticks, closes):
+    assert closes_fence(line, ticks) == closes
@@ -0,0 +1,59 @@
+from pathlib import Path
+import pytest
+
+from plover_markdown_dictionary import (
+    ColumnarRichLines,
+    Entry,
+    MarkdownDictionary,
+    Prose,
+)
+
+TEST_DATA = Path("./test/data")
+
+
+@pytest.fixture(autouse=True)
+def columnar(monkeypatch):
+    monkeypatch.setattr(MarkdownDictionary, "COLUMNAR_RICH_LINES", True)
+
+
+@pytest.mark.parametrize(
+    "test_path",
+    ["empty.md", "small.md", "weird_entries.md", "code_blocks.md", "changes.md"],
+)
+def test_load_save(test_path, tmp_path):
+    input_path = TEST_DATA / test_path
+    output_path = tmp_path / "file.md"
+
+    dictionary = MarkdownDictionary()
+    dictionary._load(str(input_path))
+    assert isinstance(dictionary.rich_lines, ColumnarRichLines)
+    dictionary._save(str(output_path))
+
+    assert input_path.read_text() == output_path.read_text()
+
+
+def test_same_lines_as_list():
+    lines = [
+        Prose("# Title\n"),
+        Entry(("TEFT",), "TEFT", value="test", updated_value="test"),
+        Entry(("S", "-G"), "S/-G", value_quote='"', value="x", comment="# c"),
+        Entry(("HEU",), "HEU", value="hi", is_deleted=True),
+        Prose("\n", is_new=True),
+    ]
+    columnar = ColumnarRichLines(lines)
+    assert len(columnar) == len(lines)
+    assert columnar == lines
+    assert [str(line) for line in columnar] == [str(line) for line in lines]
+
+
+def test_insert_and_remove():
+    columnar = ColumnarRichLines([Prose("a\n"), Prose("b\n")])
+    entry = Entry(("A",), "A", value="a", updated_value="a")
+    columnar[1:1] = [Prose("new\n", is_new=True), entry]
+    assert [str(line) for line in columnar] == ["a\n", "new\n", "A: a\n", "b\n"]
+
+    columnar[2].updated_value = "b"
+    assert str(columnar[2]) == "(UPDATED) A: b\n"
+
+    columnar[1:2] = []
+    assert [str(line) for line in columnar] == ["a\n", "(UPDATED) A: b\n", "b\n"]
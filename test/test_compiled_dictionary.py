@@ -0,0 +1,158 @@
+import os
+from pathlib import Path
+import pytest
+
+import plover_markdown_dictionary
+from plover_markdown_dictionary import (
+    CompiledDictionary,
+    MarkdownDictionary,
+    write_compiled_dictionary,
+)
+
+TEST_DATA = Path("./test/data")
+
+ITEMS = {
+    ("TEFT",): "test",
+    ("S-G",): "something",
+    ("HEU", "HRO"): "hello",
+    ("KA", "TKPWOR", "REU"): "caté\ngory",
+    ("-T",): "the",
+}
+
+
+class CompiledMarkdownDictionary(MarkdownDictionary):
+    LEAN_READONLY = True
+    COMPILED = True
+
+
+@pytest.fixture
+def unwritable(monkeypatch):
+    # permissions don't stop root writing, so pretend
+    access = os.access
+    monkeypatch.setattr(
+        os, "access", lambda path, mode: mode != os.W_OK and access(path, mode)
+    )
+
+
+def test_compiled_dictionary(tmp_path):
+    filename = str(tmp_path / "file.compiled")
+    write_compiled_dictionary(filename, ITEMS.items(), {"from": "test"})
+    compiled = CompiledDictionary(filename)
+
+    assert compiled.source == {"from": "test"}
+    assert len(compiled) == len(ITEMS)
+    assert compiled.longest_key == 3
+    for key, value in ITEMS.items():
+        assert compiled[key] == value
+        assert compiled.get(key) == value
+        assert key in compiled
+    assert compiled.get(("TEFT", "-G")) is None
+    assert compiled.get(("TEF",), "missing") == "missing"
+    assert ("TEFT", "-G") not in compiled
+    with pytest.raises(KeyError):
+        compiled[("TEFT", "-G")]
+    assert list(compiled.items()) == sorted(
+        ITEMS.items(), key=lambda item: "/".join(item[0])
+    )
+    assert list(compiled) == [key for key, _ in compiled.items()]
+    compiled.close()
+
+
+def test_empty(tmp_path):
+    filename = str(tmp_path / "file.compiled")
+    write_compiled_dictionary(filename, [], None)
+    compiled = CompiledDictionary(filename)
+    assert len(compiled) == 0
+    assert compiled.longest_key == 0
+    assert compiled.get(("TEFT",)) is None
+    assert list(compiled.items()) == []
+
+
+def test_not_compiled(tmp_path):
+    filepath = tmp_path / "file.compiled"
+    filepath.write_bytes(b"PMDC" + bytes(100))
+    with pytest.raises(ValueError):
+        CompiledDictionary(str(filepath))
+
+
+def test_open_compiled(tmp_path, monkeypatch, parse_cache_dir):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nS-G: something\nTEFT: test\n```\n")
+    compiled = MarkdownDictionary.open_compiled(str(filepath))
+    assert dict(compiled.items()) == {("S-G",): "something", ("TEFT",): "test"}
+    compiled.close()
+
+    # it's only compiled again if the file changes
+    def fail(*args):
+        raise AssertionError("compiled again")
+
+    with monkeypatch.context() as m:
+        m.setattr(plover_markdown_dictionary, "compile_dictionary", fail)
+        compiled = MarkdownDictionary.open_compiled(str(filepath))
+        assert compiled[("TEFT",)] == "test"
+        compiled.close()
+
+    filepath.write_text("```yaml\nS-G: something else\n```\n")
+    compiled = MarkdownDictionary.open_compiled(str(filepath))
+    assert dict(compiled.items()) == {("S-G",): "something else"}
+    compiled.close()
+
+    for compiled_path in parse_cache_dir.glob("*.compiled"):
+        compiled_path.write_bytes(b"corrupt")
+    compiled = MarkdownDictionary.open_compiled(str(filepath))
+    assert dict(compiled.items()) == {("S-G",): "something else"}
+    compiled.close()
+
+
+@pytest.mark.parametrize(
+    "test_path",
+    ["empty.md", "small.md", "weird_entries.md", "code_blocks.md", "changes.md"],
+)
+def test_compiled_load(test_path, tmp_path, unwritable):
+    filepath = tmp_path / test_path
+    filepath.write_bytes((TEST_DATA / test_path).read_bytes())
+
+    compiled = CompiledMarkdownDictionary.load(str(filepath))
+    full = MarkdownDictionary.load(str(filepath))
+
+    assert type(compiled._dict) is CompiledDictionary
+    assert compiled.longest_key == full.longest_key
+    assert len(compiled) == len(full)
+    for key in full:
+        assert compiled[key] == full[key]
+        assert key in compiled
+    assert dict(compiled.items()) == dict(full.items())
+
+    for value in full.reverse:
+        assert compiled.reverse_lookup(value) == full.reverse_lookup(value)
+    assert compiled.reverse_lookup("not there") == set()
+    assert type(compiled._dict) is dict
+
+
+def test_compiled_edits(tmp_path, unwritable):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nTEFT: test\nS-G: something\n```\n")
+    dictionary = CompiledMarkdownDictionary.load(str(filepath))
+    dictionary.readonly = False
+
+    dictionary[("TEFT",)] = "changed"
+    assert dictionary.reverse_lookup("changed") == {("TEFT",)}
+    dictionary.save()
+    assert filepath.read_text() == (
+        "```yaml\n(UPDATED) TEFT: changed\nS-G: something\n```\n"
+    )
+
+    # and the compiled file catches up
+    dictionary = CompiledMarkdownDictionary.load(str(filepath))
+    assert dictionary[("TEFT",)] == "changed"
+
+
+def test_compiled_clear(tmp_path, unwritable):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nTEFT: test\n```\n")
+    dictionary = CompiledMarkdownDictionary.load(str(filepath))
+    dictionary.readonly = False
+
+    dictionary.clear()
+    assert len(dictionary) == 0
+    assert dictionary.longest_key == 0
@@ -0,0 +1,66 @@
+from plover_markdown_dictionary import MarkdownDictionary
+
+
+TEXT = """# Dictionary
+
+```yaml
+TEFT: test
+S-G: something
+HEU: hi
+```
+"""
+
+
+def load(filepath):
+    dictionary = MarkdownDictionary()
+    dictionary._load(str(filepath))
+    return dictionary
+
+
+def test_unchanged_entries_keep_their_text(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+    assert dictionary.dirty_keys == set()
+    texts = [line.text for line in dictionary.rich_lines]
+
+    dictionary[("S-G",)] = "something else"
+    assert dictionary.dirty_keys == {("S-G",)}
+    dictionary._save(str(filepath))
+
+    assert dictionary.dirty_keys == set()
+    for i, line in enumerate(dictionary.rich_lines):
+        if i == 4:
+            assert line.text == "(UPDATED) S-G: something else\n"
+        else:
+            assert line.text is texts[i]
+    assert filepath.read_text() == TEXT.replace(
+        "S-G: something", "(UPDATED) S-G: something else"
+    )
+
+
+def test_repeated_definitions_are_dirty(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(
+        TEXT + "\n```yaml\nTEFT: test again\n(DELETED) HEU: hi\n```\n"
+    )
+    dictionary = load(filepath)
+    assert dictionary.dirty_keys == {("TEFT",), ("HEU",)}
+
+    dictionary._save(str(filepath))
+    assert "(UPDATED) TEFT: test again\n" in filepath.read_text()
+    assert "(DELETED) HEU: hi\n" not in filepath.read_text()
+
+
+def test_adds_are_replaced_on_each_save(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+
+    dictionary[("A",)] = "a"
+    dictionary._save(str(filepath))
+    dictionary[("B",)] = "b"
+    del dictionary[("A",)]
+    dictionary._save(str(filepath))
+
+    assert filepath.read_text() == TEXT + "\n## Added by Plover\n\n```yaml\nB: b\n```\n"
@@ -1,6 +1,11 @@
+import pickle
 import pytest
 
-from plover_markdown_dictionary import entry_from_text
+from plover_markdown_dictionary import (
+    entry_from_text,
+    plain_entry_from_text,
+    scan_entry,
+)
 
 
 @pytest.mark.parametrize(
@@ -403,3 +408,87 @@ def test_entry_fails(input):
 def test_entry_soft_fails(input, caplog):
     entry_from_text(input)
     assert "ValueError: invalid steno: " in caplog.text
+
+
+@pytest.mark.parametrize(
+    "input, parts",
+    [
+        (
+            "S-G: something  # comment\n",
+            ("", "S-G", ": ", "", "something", "  ", "# comment"),
+        ),
+        (
+            "(DELETED) 'S-G' :\t\"x\\\"\"#\n",
+            ("(DELETED) ", "'S-G'", " :\t", '"', 'x\\"', "", "#"),
+        ),
+        # only whitespace after the colon: the last space is the right side
+        (
+            "S-T:   \n",
+            ("", "S-T", ":  ", "", "", " ", ""),
+        ),
+        # "(DELETED)" is the key if the rest doesn't parse with the prefix
+        (
+            "(DELETED) : x\n",
+            ("", "(DELETED)", " : ", "", "x", "", ""),
+        ),
+    ],
+)
+def test_scan_entry(input, parts):
+    assert scan_entry(input) == parts
+
+
+def test_scan_entry_long_value():
+    # would backtrack a lot with a regular expression
+    with pytest.raises(ValueError):
+        scan_entry("S: " + "a " * 100000 + "b'c\n")
+
+
+@pytest.mark.parametrize(
+    "input",
+    [
+        "S-G: something\n",
+        "TEFT/-G: testing  \n",
+        "-T: the end\n",
+    ],
+)
+def test_plain_entry(input):
+    plain = plain_entry_from_text(input)
+    full = entry_from_text(input.replace(": ", " : ")[:-1] + " #\n")
+
+    assert plain is not None
+    assert plain.key == full.key
+    assert plain.value == full.value
+    assert str(plain) == input
+
+
+@pytest.mark.parametrize(
+    "input",
+    [
+        "(DELETED) S-G: something\n",
+        "S-G:something\n",
+        "S-G:  something\n",
+        "S-G: 'something'\n",
+        "S-G: some\\#thing\n",
+        "S-G: something # comment\n",
+        "S-G: something",
+    ],
+)
+def test_plain_entry_falls_back(input):
+    assert plain_entry_from_text(input) is None
+
+
+def test_entry_key_string():
+    normalized = entry_from_text("S-G: something\n")
+    not_normalized = entry_from_text("'#S': 1\n")
+
+    assert normalized.key_string == "S-G"
+    assert normalized._key_string is None
+    assert not_normalized.key_string == "#S"
+    assert not_normalized.key == ("1",)
+
+
+def test_entry_pickle():
+    entry = entry_from_text("(UPDATED) 'S-G' : \"some # thing\"  # comment\n")
+
+    assert pickle.loads(pickle.dumps(entry)) == entry
+    assert not hasattr(entry, "__dict__")
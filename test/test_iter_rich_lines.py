@@ -0,0 +1,45 @@
+from io import StringIO
+from pathlib import Path
+import pytest
+
+from plover_markdown_dictionary import RichLineParser, iter_rich_lines
+
+TEST_DATA = Path("./test/data")
+
+
+def test_iter_rich_lines():
+    with open(TEST_DATA / "code_blocks.md", "r") as f:
+        rich_lines = list(iter_rich_lines(f))
+
+    assert "".join(str(rich_line) for rich_line in rich_lines) == (
+        TEST_DATA / "code_blocks.md"
+    ).read_text()
+    assert [
+        rich_line.key for rich_line in rich_lines if rich_line.kind == "entry"
+    ] == [("S-G",), ("TEFT",), ("TWO",), ("THRAOE",), ("HEU",)]
+
+
+def test_iter_rich_lines_is_lazy():
+    lines = iter(["# Title\n", "```yaml\n", "S-G: something\n", "```\n"])
+    rich_lines = iter_rich_lines(lines)
+
+    assert next(rich_lines).kind == "prose"
+    assert next(rich_lines).kind == "prose"
+    assert next(lines) == "S-G: something\n"
+
+
+def test_iter_rich_lines_unclosed_code_block():
+    rich_lines = iter_rich_lines(StringIO("```yaml\nS-G: something\n"))
+
+    assert len([next(rich_lines), next(rich_lines)]) == 2
+    with pytest.raises(ValueError):
+        next(rich_lines)
+
+
+def test_plover_adds_section_end_index():
+    parser = RichLineParser(
+        StringIO("## Added by Plover\n\n```yaml\nS-G: something\n```\nText\n")
+    )
+
+    assert len(list(parser)) == 6
+    assert parser.plover_adds_section_end_index == 4
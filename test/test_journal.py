@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from plover_markdown_dictionary import MarkdownDictionary
+
+
+TEXT = """# Dictionary
+
+```yaml
+TEFT: test
+S-G: something
+```
+"""
+SAVED_TEXT = (
+    TEXT.replace("TEFT: test", "(UPDATED) TEFT: TEST").replace(
+        "S-G: something", "(DELETED) S-G: something"
+    )
+    + "\n## Added by Plover\n\n```yaml\nA/-B: a\n```\n"
+)
+
+
+@pytest.fixture
+def filepath(tmp_path, monkeypatch):
+    monkeypatch.setattr(MarkdownDictionary, "JOURNAL", True)
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    return filepath
+
+
+def journal_path(filepath):
+    return filepath.parent / (filepath.name + ".journal")
+
+
+def make_changes(dictionary):
+    dictionary[("TEFT",)] = "TEST"
+    dictionary[("A", "-B")] = "a"
+    del dictionary[("S-G",)]
+    dictionary.save()
+
+
+def test_changes_go_to_the_journal(filepath):
+    dictionary = MarkdownDictionary.load(str(filepath))
+    make_changes(dictionary)
+
+    assert filepath.read_text() == TEXT
+    assert [
+        json.loads(line) for line in journal_path(filepath).read_text().splitlines()
+    ] == [["TEFT", "TEST"], ["A/-B", "a"], ["S-G"]]
+
+
+def test_load_applies_the_journal(filepath, monkeypatch):
+    make_changes(MarkdownDictionary.load(str(filepath)))
+    monkeypatch.setattr(MarkdownDictionary, "JOURNAL", False)
+
+    dictionary = MarkdownDictionary.load(str(filepath))
+    assert dict(dictionary.items()) == {("TEFT",): "TEST", ("A", "-B"): "a"}
+
+    # saving without the journal writes its changes and removes it
+    dictionary.save()
+    assert filepath.read_text() == SAVED_TEXT
+    assert not journal_path(filepath).exists()
+
+
+def test_compact(filepath):
+    dictionary = MarkdownDictionary.load(str(filepath))
+    make_changes(dictionary)
+
+    dictionary.compact()
+    assert filepath.read_text() == SAVED_TEXT
+    assert not journal_path(filepath).exists()
+
+    dictionary[("TEFT",)] = "test"
+    assert journal_path(filepath).read_text() == '["TEFT", "test"]\n'
+
+
+def test_compact_when_journal_is_big(filepath, monkeypatch):
+    monkeypatch.setattr(MarkdownDictionary, "JOURNAL_MAX_SIZE", 30)
+    dictionary = MarkdownDictionary.load(str(filepath))
+
+    dictionary[("TEFT",)] = "TEST"
+    dictionary.save()
+    assert filepath.read_text() == TEXT
+
+    dictionary[("A", "-B")] = "a"
+    del dictionary[("S-G",)]
+    dictionary.save()
+    assert filepath.read_text() == SAVED_TEXT
+    assert not journal_path(filepath).exists()
+
+
+def test_incomplete_change(filepath):
+    journal_path(filepath).write_text('["TEFT", "TEST"]\n["S-G", "som')
+
+    dictionary = MarkdownDictionary.load(str(filepath))
+    assert dict(dictionary.items()) == {("TEFT",): "TEST", ("S-G",): "something"}
+
+
+def test_new_dictionary(tmp_path, monkeypatch):
+    monkeypatch.setattr(MarkdownDictionary, "JOURNAL", True)
+    filepath = tmp_path / "new.md"
+
+    dictionary = MarkdownDictionary.create(str(filepath))
+    dictionary.save()
+
+    assert filepath.exists()
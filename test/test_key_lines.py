@@ -0,0 +1,60 @@
+from plover_markdown_dictionary import MarkdownDictionary
+
+
+TEXT = """# Dictionary
+
+```yaml
+TEFT: test
+S-G: something
+(DELETED) HEU: hi
+TEFT: test again
+```
+"""
+
+
+def load(filepath):
+    dictionary = MarkdownDictionary()
+    dictionary._load(str(filepath))
+    return dictionary
+
+
+def test_key_lines(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+
+    assert dictionary.key_lines == {("TEFT",): [3, 6], ("S-G",): [4], ("HEU",): [5]}
+    assert dictionary.new_keys == {}
+
+
+def test_new_keys(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+
+    dictionary[("TEFT",)] = "changed"
+    dictionary[("HEU",)] = "hi again"
+    dictionary[("A",)] = "a"
+    dictionary[("B",)] = "b"
+    dictionary[("A",)] = "a again"
+    del dictionary[("B",)]
+    assert list(dictionary.new_keys) == [("A",)]
+
+    # lines added by saving don't count, so the key stays new
+    dictionary._save(str(filepath))
+    assert list(dictionary.new_keys) == [("A",)]
+    assert dictionary.key_lines == {("TEFT",): [3, 6], ("S-G",): [4], ("HEU",): [5]}
+
+    dictionary = load(filepath)
+    assert dictionary.new_keys == {}
+    assert ("A",) in dictionary.key_lines
+
+
+def test_new_keys_bulk_update(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+
+    dictionary.clear()
+    dictionary.update({("TEFT",): "test", ("A",): "a"})
+    assert list(dictionary.new_keys) == [("A",)]
@@ -0,0 +1,168 @@
+import os
+from pathlib import Path
+import pytest
+
+from plover_markdown_dictionary import LazyValues, MarkdownDictionary
+
+TEST_DATA = Path("./test/data")
+
+
+class LeanMarkdownDictionary(MarkdownDictionary):
+    LEAN_READONLY = True
+
+
+class LazyMarkdownDictionary(MarkdownDictionary):
+    LEAN_READONLY = True
+    LAZY_VALUES = True
+
+
+@pytest.fixture
+def unwritable(monkeypatch):
+    # permissions don't stop root writing, so pretend
+    access = os.access
+    monkeypatch.setattr(
+        os, "access", lambda path, mode: mode != os.W_OK and access(path, mode)
+    )
+
+
+def edit(dictionary):
+    dictionary.readonly = False
+    del dictionary[list(dictionary)[-1]]
+    dictionary[("TEFT",)] = "changed"
+    dictionary[("A", "B")] = "new"
+
+
+@pytest.mark.parametrize(
+    "test_path",
+    ["empty.md", "small.md", "weird_entries.md", "code_blocks.md", "changes.md"],
+)
+def test_lean_load(test_path, tmp_path, unwritable):
+    filepath = tmp_path / test_path
+    filepath.write_bytes((TEST_DATA / test_path).read_bytes())
+
+    lean = LeanMarkdownDictionary.load(str(filepath))
+    full = MarkdownDictionary.load(str(filepath))
+
+    assert lean.readonly
+    assert lean.rich_lines is None
+    assert list(lean.items()) == list(full.items())
+    assert lean.reverse == full.reverse
+    assert lean.casereverse == full.casereverse
+    assert lean.longest_key == full.longest_key
+
+
+def test_writable_files_arent_lean(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_bytes((TEST_DATA / "small.md").read_bytes())
+
+    dictionary = LeanMarkdownDictionary.load(str(filepath))
+    assert dictionary.rich_lines is not None
+
+
+@pytest.mark.parametrize(
+    "test_path", ["small.md", "weird_entries.md", "code_blocks.md", "changes.md"]
+)
+def test_save_parses_first(test_path, tmp_path, unwritable):
+    lean_path = tmp_path / "lean.md"
+    full_path = tmp_path / "full.md"
+    lean_path.write_bytes((TEST_DATA / test_path).read_bytes())
+    full_path.write_bytes((TEST_DATA / test_path).read_bytes())
+
+    lean = LeanMarkdownDictionary.load(str(lean_path))
+    full = MarkdownDictionary.load(str(full_path))
+    edit(lean)
+    edit(full)
+    lean.save()
+    full.save()
+
+    assert lean_path.read_text() == full_path.read_text()
+    assert lean.rich_lines == full.rich_lines
+
+
+def test_save_missing_file(tmp_path, unwritable):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nS-G: something\n```\n")
+    dictionary = LeanMarkdownDictionary.load(str(filepath))
+    filepath.unlink()
+
+    dictionary.readonly = False
+    dictionary.save()
+    assert dict(MarkdownDictionary.load(str(filepath)).items()) == {
+        ("S-G",): "something"
+    }
+
+
+def test_load_fails(tmp_path, unwritable):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nS-G: something\n")
+    with pytest.raises(ValueError):
+        LeanMarkdownDictionary.load(str(filepath))
+
+    filepath.write_text("```yaml\nS-G something\n```\n")
+    with pytest.raises(Exception, match="Problem on line 1"):
+        LeanMarkdownDictionary.load(str(filepath))
+
+
+@pytest.mark.parametrize(
+    "test_path",
+    ["empty.md", "small.md", "weird_entries.md", "code_blocks.md", "changes.md"],
+)
+def test_lazy_load(test_path, tmp_path, unwritable):
+    filepath = tmp_path / test_path
+    filepath.write_bytes((TEST_DATA / test_path).read_bytes())
+
+    lazy = LazyMarkdownDictionary.load(str(filepath))
+    full = MarkdownDictionary.load(str(filepath))
+
+    assert type(lazy._dict) is LazyValues
+    assert lazy.longest_key == full.longest_key
+    assert list(lazy) == list(full)
+    for key in full:
+        assert lazy[key] == full[key]
+        assert lazy.get(key) == full.get(key)
+    assert list(lazy.items()) == list(full.items())
+    assert type(lazy._dict) is LazyValues
+
+    assert lazy.reverse_lookup("not there") == set()
+    assert type(lazy._dict) is dict
+    for value in full.reverse:
+        assert lazy.reverse_lookup(value) == full.reverse_lookup(value)
+        assert lazy.casereverse_lookup(value) == full.casereverse_lookup(value)
+    assert lazy.reverse == full.reverse
+    assert lazy.casereverse == full.casereverse
+
+
+def test_lazy_edits(tmp_path, unwritable):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nTEFT: test\nS-G: something\nHEU: hi\n```\n")
+    dictionary = LazyMarkdownDictionary.load(str(filepath))
+    dictionary.readonly = False
+
+    dictionary[("TEFT",)] = "hi"
+    del dictionary[("S-G",)]
+    assert dictionary.reverse_lookup("hi") == {("TEFT",), ("HEU",)}
+    assert dictionary.reverse_lookup("something") == set()
+
+    dictionary.save()
+    assert filepath.read_text() == (
+        "```yaml\n(UPDATED) TEFT: hi\n(DELETED) S-G: something\nHEU: hi\n```\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "test_path", ["small.md", "weird_entries.md", "code_blocks.md", "changes.md"]
+)
+def test_lazy_save(test_path, tmp_path, unwritable):
+    lazy_path = tmp_path / "lazy.md"
+    full_path = tmp_path / "full.md"
+    lazy_path.write_bytes((TEST_DATA / test_path).read_bytes())
+    full_path.write_bytes((TEST_DATA / test_path).read_bytes())
+
+    lazy = LazyMarkdownDictionary.load(str(lazy_path))
+    full = MarkdownDictionary.load(str(full_path))
+    lazy.readonly = False
+    lazy.save()
+    full.readonly = False
+    full.save()
+
+    assert lazy_path.read_text() == full_path.read_text()
@@ -0,0 +1,174 @@
+import os
+import time
+import pytest
+
+from plover_markdown_dictionary import LoadCache, MarkdownDictionary
+
+
+class ColumnarMarkdownDictionary(MarkdownDictionary):
+    COLUMNAR_RICH_LINES = True
+
+
+CONTENT = """# Dictionary
+
+```yaml
+TEFT: test
+S-G: something
+"-G": ing
+```
+"""
+
+
+class Parse:
+    pass
+
+
+@pytest.fixture(autouse=True)
+def use_load_cache(monkeypatch):
+    monkeypatch.setattr(MarkdownDictionary, "LOAD_CACHE", True)
+
+
+def write_old_file(filepath, text):
+    """Write a file modified long enough ago that its parse is cached."""
+    filepath.write_text(text)
+    old = time.time() - 60
+    os.utime(str(filepath), (old, old))
+
+
+def test_load_cache():
+    cache = LoadCache(100)
+    parse = Parse()
+    cache.put("a", (10, 1), 10, parse)
+    assert cache.get("a", (10, 1)) is parse
+    assert cache.get("b", (10, 1)) is None
+
+    # a changed file's parse is only there to reuse its code blocks
+    assert cache.get("a", (10, 2)) is None
+    assert cache.previous("a") is parse
+    assert cache.previous("b") is None
+
+    # and so is one made while the file could still change unnoticed
+    cache.put("a", None, 10, parse)
+    assert cache.get("a", (10, 1)) is None
+    assert cache.previous("a") is parse
+    assert cache.size == 10
+
+
+def test_least_recently_used_are_dropped():
+    cache = LoadCache(100)
+    parses = {name: Parse() for name in "abc"}
+    cache.put("a", (40, 1), 40, parses["a"])
+    cache.put("b", (40, 1), 40, parses["b"])
+    cache.get("a", (40, 1))
+    cache.put("c", (40, 1), 40, parses["c"])
+    assert cache.size == 80
+
+    # once nothing else uses it
+    del parses["b"]
+    assert cache.get("b", (40, 1)) is None
+    parses.clear()
+    assert cache.get("a", (40, 1)) is not None
+    assert cache.get("c", (40, 1)) is not None
+
+
+def test_parses_in_use_are_kept():
+    cache = LoadCache(100)
+    parse = Parse()
+    cache.put("a", (101, 1), 101, parse)
+    assert cache.get("a", (101, 1)) is parse
+    assert cache.size == 0
+
+    del parse
+    assert cache.get("a", (101, 1)) is None
+
+
+def test_dictionaries_let_go_of_parses(tmp_path):
+    filepath = tmp_path / "file.md"
+    write_old_file(filepath, CONTENT)
+    first = MarkdownDictionary.load(str(filepath))
+    assert first.shared_parse is not None
+
+    first.path = None
+    first[("TEFT",)] = "changed"
+    assert first.shared_parse is not None
+    first._write(str(tmp_path / "other.md"), first._take_changes())
+    assert first.shared_parse is None
+
+@pytest.mark.parametrize(
+    "dictionary_class", [MarkdownDictionary, ColumnarMarkdownDictionary]
+)
+def test_shared_parse(dictionary_class, tmp_path):
+    filepath = tmp_path / "file.md"
+    write_old_file(filepath, CONTENT)
+    first = dictionary_class.load(str(filepath))
+    second = dictionary_class.load(str(filepath))
+
+    assert second._dict is first._dict
+    assert second.rich_lines is first.rich_lines
+    assert dict(second.items()) == {
+        ("TEFT",): "test",
+        ("S-G",): "something",
+        ("-G",): "ing",
+    }
+    assert second.reverse_lookup("test") == {("TEFT",)}
+
+    second[("TEFT",)] = "changed"
+    second[("TEFT", "-G")] = "testing"
+    second.save()
+    assert first[("TEFT",)] == "test"
+    assert ("TEFT", "-G") not in first
+    assert first.reverse_lookup("changed") == set()
+    assert first.rich_lines[3].updated_value == "test"
+    assert len(first.rich_lines) == 7
+    assert filepath.read_text() == CONTENT.replace(
+        "TEFT: test", "(UPDATED) TEFT: changed"
+    ) + "\n## Added by Plover\n\n```yaml\nTEFT/-G: testing\n```\n"
+
+    first.path = None
+    del first[("S-G",)]
+    assert second[("S-G",)] == "something"
+
+
+def test_changed_file_is_parsed(tmp_path):
+    filepath = tmp_path / "file.md"
+    write_old_file(filepath, CONTENT)
+    first = MarkdownDictionary.load(str(filepath))
+    write_old_file(filepath, CONTENT.replace("TEFT: test", "TEFT: changed"))
+    second = MarkdownDictionary.load(str(filepath))
+
+    assert second._dict is not first._dict
+    assert second[("TEFT",)] == "changed"
+
+
+def test_recent_file_is_not_cached(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(CONTENT)
+    first = MarkdownDictionary.load(str(filepath))
+    second = MarkdownDictionary.load(str(filepath))
+    assert second._dict is not first._dict
+    assert second._dict == first._dict
+
+
+def test_clear_shared(tmp_path):
+    filepath = tmp_path / "file.md"
+    write_old_file(filepath, CONTENT)
+    first = MarkdownDictionary.load(str(filepath))
+    second = MarkdownDictionary.load(str(filepath))
+
+    second.path = None
+    second.clear()
+    assert len(second) == 0
+    assert len(first) == 3
+    assert first.reverse_lookup("test") == {("TEFT",)}
+
+
+def test_apply_changes_shared(tmp_path):
+    filepath = tmp_path / "file.md"
+    write_old_file(filepath, CONTENT)
+    first = MarkdownDictionary.load(str(filepath))
+    second = MarkdownDictionary.load(str(filepath))
+
+    second.apply_changes(adds={("-D",): "ed"}, deletes=[("TEFT",)])
+    assert first[("TEFT",)] == "test"
+    assert ("-D",) not in first
+    assert MarkdownDictionary.load(str(filepath))[("-D",)] == "ed"
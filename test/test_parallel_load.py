@@ -0,0 +1,75 @@
+from pathlib import Path
+import pytest
+
+import plover_markdown_dictionary
+from plover_markdown_dictionary import MarkdownDictionary
+
+TEST_DATA = Path("./test/data")
+
+
+@pytest.fixture
+def parallel_load(monkeypatch):
+    """Returns a list of the files parsed in parallel."""
+    monkeypatch.setattr(MarkdownDictionary, "PARALLEL_LOAD", True)
+    monkeypatch.setattr(MarkdownDictionary, "PARALLEL_LOAD_MIN_SIZE", 0)
+    monkeypatch.setattr(MarkdownDictionary, "PARALLEL_LOAD_WORKERS", 2)
+    # or the parallel load just reads what the serial one cached
+    monkeypatch.setattr(MarkdownDictionary, "PARSE_CACHE", False)
+
+    parsed = []
+    parse_in_parallel = plover_markdown_dictionary.parse_rich_lines_in_parallel
+
+    def parse_rich_lines_in_parallel(f, *args):
+        parsed.append(f.name)
+        return parse_in_parallel(f, *args)
+
+    monkeypatch.setattr(
+        plover_markdown_dictionary,
+        "parse_rich_lines_in_parallel",
+        parse_rich_lines_in_parallel,
+    )
+    return parsed
+
+
+@pytest.mark.parametrize(
+    "test_path",
+    ["empty.md", "small.md", "weird_entries.md", "code_blocks.md", "changes.md"],
+)
+def test_parallel_load(test_path, parallel_load):
+    serial = MarkdownDictionary()
+    serial.PARALLEL_LOAD = False
+    serial._load(str(TEST_DATA / test_path))
+
+    dictionary = MarkdownDictionary()
+    dictionary._load(str(TEST_DATA / test_path))
+
+    assert parallel_load == [str(TEST_DATA / test_path)]
+    assert dictionary.rich_lines == serial.rich_lines
+    assert dict(dictionary.items()) == dict(serial.items())
+    assert (
+        dictionary.plover_adds_section_end_index
+        == serial.plover_adds_section_end_index
+    )
+
+
+def test_parallel_load_later_duplicates_win(tmp_path, parallel_load):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(
+        "```yaml\n"
+        + "".join(f"S-G: {i}\n" for i in range(3000))
+        + "```\n\n```\nS-G: last\n```\n"
+    )
+
+    dictionary = MarkdownDictionary()
+    dictionary._load(str(filepath))
+
+    assert parallel_load == [str(filepath)]
+    assert dictionary[("S-G",)] == "last"
+    assert len(dictionary.rich_lines) == 3006
+
+
+def test_parallel_load_fails(parallel_load):
+    dictionary = MarkdownDictionary()
+    with pytest.raises(Exception):
+        dictionary._load(str(TEST_DATA / "error_unequal_code_block.md"))
+    assert len(parallel_load) == 1
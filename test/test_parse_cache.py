@@ -0,0 +1,101 @@
+import os
+from pathlib import Path
+import pytest
+
+import plover_markdown_dictionary
+from plover_markdown_dictionary import MarkdownDictionary
+
+TEST_DATA = Path("./test/data")
+
+
+def load(filepath):
+    dictionary = MarkdownDictionary()
+    dictionary._load(str(filepath))
+    return dictionary
+
+
+@pytest.mark.parametrize(
+    "test_path",
+    ["empty.md", "small.md", "weird_entries.md", "code_blocks.md", "changes.md"],
+)
+def test_cached_load(test_path, tmp_path, parse_cache_dir):
+    filepath = tmp_path / test_path
+    filepath.write_bytes((TEST_DATA / test_path).read_bytes())
+
+    parsed = load(filepath)
+    assert len(list(parse_cache_dir.iterdir())) == 1
+
+    cached = load(filepath)
+    assert cached.rich_lines == parsed.rich_lines
+    assert dict(cached.items()) == dict(parsed.items())
+    assert (
+        cached.plover_adds_section_end_index == parsed.plover_adds_section_end_index
+    )
+
+
+def test_cache_is_used(tmp_path, monkeypatch):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nS-G: something\n```\n")
+    load(filepath)
+
+    def fail(*args):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(MarkdownDictionary, "_parse", fail)
+    assert load(filepath)[("S-G",)] == "something"
+
+
+def test_stale_cache(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nS-G: something\n```\n")
+    load(filepath)
+
+    filepath.write_text("```yaml\nS-G: something else\n```\n")
+    assert load(filepath)[("S-G",)] == "something else"
+
+
+def test_same_size_and_mtime(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nS-G: aaa\n```\n")
+    stat = filepath.stat()
+    load(filepath)
+
+    filepath.write_text("```yaml\nS-G: bbb\n```\n")
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load(filepath)[("S-G",)] == "bbb"
+
+
+def test_corrupt_cache(tmp_path, parse_cache_dir):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nS-G: something\n```\n")
+    load(filepath)
+
+    for cache_file in parse_cache_dir.iterdir():
+        cache_file.write_bytes(b"not a pickle")
+    assert load(filepath)[("S-G",)] == "something"
+    assert load(filepath)[("S-G",)] == "something"
+
+
+def test_truncated_cache(tmp_path, parse_cache_dir, monkeypatch):
+    monkeypatch.setattr(plover_markdown_dictionary, "PICKLE_CHUNK_SIZE", 2)
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nS-G: something\nTEFT: test\nHEU/HRO: hello\n```\n")
+    parsed = load(filepath)
+
+    for cache_file in parse_cache_dir.iterdir():
+        cache_file.write_bytes(cache_file.read_bytes()[:-10])
+    loaded = load(filepath)
+    assert loaded.rich_lines == parsed.rich_lines
+    assert dict(loaded.items()) == dict(parsed.items())
+    assert loaded.reverse_lookup("hello") == {("HEU", "HRO")}
+    assert loaded.longest_key == 2
+
+
+def test_unwritable_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        MarkdownDictionary, "PARSE_CACHE_DIR", str(tmp_path / "file.md" / "cache")
+    )
+    filepath = tmp_path / "file.md"
+    filepath.write_text("```yaml\nS-G: something\n```\n")
+
+    assert load(filepath)[("S-G",)] == "something"
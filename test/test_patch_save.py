@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from plover_markdown_dictionary import MarkdownDictionary
+
+
+TEXT = """# Dictionary
+
+```yaml
+TEFT: test
+S-G: something
+```
+
+## Added by Plover
+
+```yaml
+HEU: hi
+```
+
+The end.
+"""
+
+
+@pytest.fixture(autouse=True)
+def patch_save(monkeypatch):
+    monkeypatch.setattr(MarkdownDictionary, "PATCH_SAVE", True)
+
+
+def saved_text(filepath, *changes):
+    """What saving the changes to TEXT writes without patching."""
+    filepath.write_text(TEXT)
+    dictionary = MarkdownDictionary()
+    dictionary.PATCH_SAVE = False
+    dictionary._load(str(filepath))
+    for change in changes:
+        change(dictionary)
+    dictionary._save(str(filepath))
+    return filepath.read_text()
+
+
+def set_value(key, value):
+    def change(dictionary):
+        dictionary[key] = value
+
+    return change
+
+
+def delete(key):
+    def change(dictionary):
+        del dictionary[key]
+
+    return change
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        [],
+        [set_value(("TEFT",), "tests")],
+        [set_value(("TEFT",), "TEST")],
+        [delete(("S-G",))],
+        [set_value(("A",), "a")],
+        [set_value(("A",), "a"), set_value(("TEFT",), "tests")],
+    ],
+)
+def test_patch(tmp_path, changes):
+    expected = saved_text(tmp_path / "expected.md", *changes)
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = MarkdownDictionary.load(str(filepath))
+    inode = os.stat(filepath).st_ino
+
+    for change in changes:
+        change(dictionary)
+    dictionary.save()
+
+    assert filepath.read_text() == expected
+    assert os.stat(filepath).st_ino == inode
+
+
+def test_patch_repeatedly(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = MarkdownDictionary.load(str(filepath))
+
+    changes = []
+    for change in [
+        set_value(("A",), "a"),
+        set_value(("B",), "b"),
+        delete(("A",)),
+        set_value(("TEFT",), "TEST"),
+        delete(("B",)),
+    ]:
+        change(dictionary)
+        changes.append(change)
+        dictionary.save()
+        assert filepath.read_text() == saved_text(tmp_path / "expected.md", *changes)
+
+
+def test_file_changed_since_load(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = MarkdownDictionary.load(str(filepath))
+    filepath.write_text(TEXT + "More text.\n")
+
+    dictionary[("TEFT",)] = "TEST"
+    dictionary.save()
+
+    assert filepath.read_text() == TEXT.replace("TEFT: test", "(UPDATED) TEFT: TEST")
+
+
+def test_crlf_newlines(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_bytes(TEXT.replace("\n", "\r\n").encode())
+    dictionary = MarkdownDictionary.load(str(filepath))
+
+    dictionary[("TEFT",)] = "TEST"
+    dictionary.save()
+
+    assert filepath.read_bytes() == (
+        TEXT.replace("TEFT: test", "(UPDATED) TEFT: TEST").encode()
+    )
@@ -0,0 +1,204 @@
+import pytest
+
+from plover_markdown_dictionary import MarkdownDictionary
+
+
+TEXT = """# Dictionary
+
+```yaml
+TEFT: test
+S-G: something
+```
+
+## Section
+
+```yaml
+HEU: hi
+S-G: something else
+```
+"""
+
+
+def load(filepath):
+    dictionary = MarkdownDictionary()
+    dictionary._load(str(filepath))
+    return dictionary
+
+
+def assert_same_as_load(dictionary, filepath):
+    loaded = load(filepath)
+    assert dictionary.rich_lines == loaded.rich_lines
+    assert dict(dictionary.items()) == dict(loaded.items())
+    assert dictionary.longest_key == loaded.longest_key
+    assert (
+        dictionary.plover_adds_section_end_index
+        == loaded.plover_adds_section_end_index
+    )
+
+
+def test_reload_reuses_unchanged_blocks(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+    first_block = dictionary.rich_lines[3:5]
+
+    filepath.write_text(TEXT.replace("HEU: hi", "HEU: hello\nHEL/HRO: hello"))
+    dictionary.reload(str(filepath))
+
+    assert all(a is b for a, b in zip(dictionary.rich_lines[3:5], first_block))
+    assert dictionary[("HEU",)] == "hello"
+    assert dictionary[("HEL", "HRO")] == "hello"
+    assert dictionary.longest_key == 2
+    assert_same_as_load(dictionary, filepath)
+
+
+def test_reload_removed_block(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+    assert dictionary[("S-G",)] == "something else"
+
+    filepath.write_text(TEXT[: TEXT.index("## Section")])
+    dictionary.reload(str(filepath))
+
+    assert dictionary[("S-G",)] == "something"
+    assert ("HEU",) not in dictionary
+    assert_same_as_load(dictionary, filepath)
+
+
+def test_reload_moved_blocks(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+
+    first, second = TEXT.split("## Section\n")
+    filepath.write_text(second + first)
+    dictionary.reload(str(filepath))
+
+    assert dictionary[("S-G",)] == "something"
+    assert_same_as_load(dictionary, filepath)
+
+
+def test_reload_after_save(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+
+    dictionary[("TEFT",)] = "tests"
+    dictionary[("TPHU",)] = "new"
+    dictionary._save(str(filepath))
+    dictionary[("TEFT",)] = "test"
+    dictionary.reload(str(filepath))
+
+    assert dictionary[("TEFT",)] == "tests"
+    assert_same_as_load(dictionary, filepath)
+
+
+def test_reload_discards_unsaved_edits(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath)
+
+    dictionary[("TPHU",)] = "new"
+    del dictionary[("TEFT",)]
+    dictionary.reload(str(filepath))
+
+    assert ("TPHU",) not in dictionary
+    assert dictionary[("TEFT",)] == "test"
+    assert_same_as_load(dictionary, filepath)
+
+
+def test_reload_without_load(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = MarkdownDictionary()
+    dictionary[("TPHU",)] = "new"
+
+    dictionary.reload(str(filepath))
+
+    assert_same_as_load(dictionary, filepath)
+
+
+def full_load(filepath):
+    dictionary = MarkdownDictionary()
+    dictionary.LOAD_CACHE = False
+    dictionary.PARSE_CACHE = False
+    dictionary._load(str(filepath))
+    return dictionary
+
+
+def full_load_text(tmp_path, text):
+    filepath = tmp_path / "other.md"
+    filepath.write_text(text)
+    return full_load(filepath)
+
+
+@pytest.fixture
+def use_load_cache(monkeypatch):
+    monkeypatch.setattr(MarkdownDictionary, "LOAD_CACHE", True)
+
+
+def test_load_reuses_unchanged_blocks(tmp_path, use_load_cache):
+    # like Plover, which loads a changed file into a new dictionary
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    old = MarkdownDictionary.load(str(filepath))
+
+    filepath.write_text(TEXT.replace("HEU: hi", "HEU: hello\nHEL/HRO: hello"))
+    dictionary = MarkdownDictionary.load(str(filepath))
+
+    assert all(
+        a is b for a, b in zip(dictionary.rich_lines[3:5], old.rich_lines[3:5])
+    )
+    assert dictionary.rich_lines[10] is not old.rich_lines[10]
+    assert dictionary[("HEU",)] == "hello"
+    assert dictionary[("HEL", "HRO")] == "hello"
+    assert old[("HEU",)] == "hi"
+    loaded = full_load(filepath)
+    assert dictionary.rich_lines == loaded.rich_lines
+    assert dict(dictionary.items()) == dict(loaded.items())
+    assert dictionary.longest_key == loaded.longest_key
+
+
+@pytest.mark.parametrize(
+    "new_text",
+    [
+        TEXT[: TEXT.index("## Section")],
+        "## Section\n".join(reversed(TEXT.split("## Section\n"))),
+        TEXT.replace("TEFT: test", "(DELETED) TEFT: test"),
+        TEXT + "\n```yaml\nTEFT: last\n```\n",
+        "",
+    ],
+)
+def test_load_reusing_blocks_matches_parse(new_text, tmp_path, use_load_cache):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    old = MarkdownDictionary.load(str(filepath))
+
+    filepath.write_text(new_text)
+    dictionary = MarkdownDictionary.load(str(filepath))
+    loaded = full_load(filepath)
+
+    assert dictionary.rich_lines == loaded.rich_lines
+    assert dict(dictionary.items()) == dict(loaded.items())
+    assert dictionary.reverse == loaded.reverse
+    assert dictionary.code_blocks == loaded.code_blocks
+    assert dictionary.dirty_keys == loaded.dirty_keys
+    assert dict(old.items()) == dict(full_load_text(tmp_path, TEXT).items())
+
+
+def test_load_after_save_reusing_blocks(tmp_path, use_load_cache):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    old = MarkdownDictionary.load(str(filepath))
+    old[("TEFT",)] = "tests"
+    old[("TPHU",)] = "new"
+    old._save(str(filepath))
+
+    filepath.write_text(filepath.read_text().replace("HEU: hi", "HEU: hello"))
+    dictionary = MarkdownDictionary.load(str(filepath))
+
+    loaded = full_load(filepath)
+    assert dictionary.rich_lines == loaded.rich_lines
+    assert dict(dictionary.items()) == dict(loaded.items())
+    assert dictionary[("TEFT",)] == "tests"
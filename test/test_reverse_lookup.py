@@ -0,0 +1,117 @@
+import gc
+from pathlib import Path
+import pytest
+
+from plover.steno_dictionary import StenoDictionary
+
+from plover_markdown_dictionary import MarkdownDictionary, gc_paused
+
+TEST_DATA = Path("./test/data")
+
+TEXT = """# Dictionary
+
+```yaml
+TEFT: test
+S-G: Test
+(DELETED) HEU: hi
+TEFT: test again
+HEU/HRO: hello
+(DELETED) HEU/HRO: hello
+```
+"""
+
+
+def load(filepath, parse_cache):
+    dictionary = MarkdownDictionary()
+    dictionary.PARSE_CACHE = parse_cache
+    dictionary._load(str(filepath))
+    return dictionary
+
+
+def reverse_lookups(dictionary):
+    return (
+        {value: set(keys) for value, keys in dictionary.reverse.items() if keys},
+        {
+            value: set(values)
+            for value, values in dictionary.casereverse.items()
+            if values
+        },
+    )
+
+
+def expected_reverse_lookups(dictionary):
+    expected = StenoDictionary()
+    expected.update(dict(dictionary.items()))
+    return reverse_lookups(expected)
+
+
+@pytest.mark.parametrize("parse_cache", [False, True])
+@pytest.mark.parametrize(
+    "test_path",
+    ["empty.md", "small.md", "weird_entries.md", "code_blocks.md", "changes.md"],
+)
+def test_reverse_lookups(test_path, parse_cache, tmp_path):
+    filepath = tmp_path / test_path
+    filepath.write_bytes((TEST_DATA / test_path).read_bytes())
+    # the second load is from the cache
+    load(filepath, parse_cache)
+    dictionary = load(filepath, parse_cache)
+
+    assert reverse_lookups(dictionary) == expected_reverse_lookups(dictionary)
+
+
+def test_repeated_keys(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath, False)
+
+    assert dictionary.reverse_lookup("test") == set()
+    assert dictionary.reverse_lookup("test again") == {("TEFT",)}
+    assert dictionary.reverse_lookup("hello") == {("HEU", "HRO")}
+    assert dictionary.casereverse_lookup("test") == {"Test"}
+    assert dictionary.longest_key == 2
+
+
+def test_edits(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    dictionary = load(filepath, False)
+
+    dictionary[("TEFT",)] = "Test"
+    del dictionary[("HEU", "HRO")]
+    dictionary[("A",)] = "hello"
+
+    assert dictionary.reverse_lookup("Test") == {("TEFT",), ("S-G",)}
+    assert dictionary.reverse_lookup("hello") == {("A",)}
+    assert reverse_lookups(dictionary) == expected_reverse_lookups(dictionary)
+    assert dictionary.longest_key == 1
+
+
+def test_load_collects_garbage_after(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text(TEXT)
+    load(filepath, False)
+    assert gc.isenabled()
+
+    filepath.write_text("```yaml\nTEFT test\n```\n")
+    with pytest.raises(Exception):
+        load(filepath, False)
+    assert gc.isenabled()
+
+
+def test_gc_paused_overlapping():
+    enabled = gc.isenabled()
+    gc.enable()
+    try:
+        first = gc_paused()
+        second = gc_paused()
+        first.__enter__()
+        second.__enter__()
+        assert not gc.isenabled()
+        first.__exit__(None, None, None)
+        assert not gc.isenabled()
+        second.__exit__(None, None, None)
+        assert gc.isenabled()
+    finally:
+        if not enabled:
+            gc.disable()
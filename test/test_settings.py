@@ -0,0 +1,71 @@
+from plover_markdown_dictionary import MarkdownDictionary, apply_settings
+
+
+def settings_class():
+    return type("Dictionary", (MarkdownDictionary,), {})
+
+
+def test_apply_settings():
+    cls = settings_class()
+    apply_settings(
+        cls,
+        "LEAN_READONLY, LAZY_VALUES BACKGROUND_SAVE_DELAY=2.5 "
+        "PARSE_CACHE=False PARALLEL_LOAD_WORKERS=3 PARSE_CACHE_DIR=/tmp/cache",
+    )
+    assert cls.LEAN_READONLY is True
+    assert cls.LAZY_VALUES is True
+    assert cls.BACKGROUND_SAVE_DELAY == 2.5
+    assert cls.PARSE_CACHE is False
+    assert cls.PARALLEL_LOAD_WORKERS == 3
+    assert cls.PARSE_CACHE_DIR == "/tmp/cache"
+    assert MarkdownDictionary.LEAN_READONLY is False
+
+
+def test_no_settings():
+    cls = settings_class()
+    apply_settings(cls, "")
+    assert "LEAN_READONLY" not in cls.__dict__
+
+
+def test_unknown_settings(caplog):
+    cls = settings_class()
+    apply_settings(cls, "PLOVER_ADDS_TITLE=x NOT_A_SETTING JOURNAL")
+    assert "PLOVER_ADDS_TITLE" not in cls.__dict__
+    assert cls.JOURNAL is True
+    assert "PLOVER_ADDS_TITLE" in caplog.text
+    assert "NOT_A_SETTING" in caplog.text
+
+
+def test_boolean_settings():
+    cls = settings_class()
+    apply_settings(cls, "PARSE_CACHE=false LOAD_CACHE=off LEAN_READONLY=On JOURNAL=1")
+    assert cls.PARSE_CACHE is False
+    assert cls.LOAD_CACHE is False
+    assert cls.LEAN_READONLY is True
+    assert cls.JOURNAL is True
+
+
+def test_invalid_values(caplog):
+    cls = settings_class()
+    apply_settings(
+        cls,
+        "PARALLEL_LOAD_MIN_SIZE=4MB PARSE_CACHE=maybe PARALLEL_LOAD_WORKERS=some "
+        "BACKGROUND_SAVE_DELAY JOURNAL_MAX_AGE=1.5",
+    )
+    for name in (
+        "PARALLEL_LOAD_MIN_SIZE",
+        "PARSE_CACHE",
+        "PARALLEL_LOAD_WORKERS",
+        "BACKGROUND_SAVE_DELAY",
+        "JOURNAL_MAX_AGE",
+    ):
+        assert name not in cls.__dict__
+        assert name in caplog.text
+
+
+def test_workers_setting():
+    cls = settings_class()
+    apply_settings(cls, "PARALLEL_LOAD_WORKERS=2")
+    assert cls.PARALLEL_LOAD_WORKERS == 2
+    apply_settings(cls, "PARALLEL_LOAD_WORKERS=None")
+    assert cls.PARALLEL_LOAD_WORKERS is None
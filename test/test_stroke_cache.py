@@ -0,0 +1,46 @@
+import pytest
+
+from plover.steno import normalize_steno
+
+from plover_markdown_dictionary import StrokeCache, entry_from_text
+
+
+def test_normalize():
+    cache = StrokeCache(100)
+    for key_string in ["S-G", "TEFT/-G", "1-9", "#S/-D", "-"]:
+        assert cache.normalize(key_string) == normalize_steno(key_string)
+
+    with pytest.raises(ValueError):
+        cache.normalize("not steno")
+
+
+def test_strokes_are_shared():
+    cache = StrokeCache(100)
+    first = cache.normalize("TEFT/-G")
+    second = cache.normalize("-G/TEFT")
+    assert first[0] is second[1]
+    assert first[1] is second[0]
+
+
+def test_counters():
+    cache = StrokeCache(100)
+    cache.normalize("TEFT/-G")
+    cache.normalize("-G")
+    cache.normalize("TEFT/-G/-D")
+    assert (cache.hits, cache.misses) == (3, 3)
+
+
+def test_max_size():
+    cache = StrokeCache(2)
+    cache.normalize("TEFT/-G")
+    cache.normalize("-D")
+    assert len(cache.strokes) == 1
+    assert cache.normalize("-D") == ("-D",)
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_entries_share_strokes():
+    first = entry_from_text("TEFT/-G: testing\n")
+    second = entry_from_text("'-G/TEFT': \"something\" # comment\n")
+    assert first.key[0] is second.key[1]
+    assert first.key[1] is second.key[0]
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from plover_markdown_dictionary import write_lines_atomically
+
+
+def test_write(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("old\n")
+    os.chmod(filepath, 0o640)
+
+    write_lines_atomically(str(filepath), (f"{i}\n" for i in range(10000)))
+
+    assert filepath.read_text() == "".join(f"{i}\n" for i in range(10000))
+    assert os.stat(filepath).st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["file.md"]
+
+
+def test_new_file(tmp_path):
+    filepath = tmp_path / "file.md"
+
+    write_lines_atomically(str(filepath), ["a\n", "b\n"])
+
+    assert filepath.read_text() == "a\nb\n"
+
+
+def test_failure_keeps_the_file(tmp_path):
+    filepath = tmp_path / "file.md"
+    filepath.write_text("old\n")
+
+    def lines():
+        yield "new\n"
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        write_lines_atomically(str(filepath), lines())
+
+    assert filepath.read_text() == "old\n"
+    assert os.listdir(tmp_path) == ["file.md"]